@@ -0,0 +1,287 @@
+"""A scrolling agenda of today and the coming week.
+
+The agenda can hold hundreds of events, but only the rows inside the
+viewport have canvas items. They are drawn into a small pool of row slots
+that is reused as the list scrolls, so the number of canvas items, and with
+it memory and redraw time, stays the same however busy the week is.
+"""
+
+import bisect
+import collections
+import datetime
+import tkinter as tk
+from tkinter import ttk
+
+import metrics
+
+AGENDA_DAYS = 8  # Today and the week after it
+DAY_ROW_HEIGHT = 28
+EVENT_ROW_HEIGHT = 48
+EMPTY_ROW_HEIGHT = 24
+SCROLL_UNIT = 24  # Pixels per mouse wheel step
+WIDTH = 300
+
+# One line of the agenda: a day heading, an event, or "No events".
+# ``y`` is the row's offset from the top of the whole agenda.
+Row = collections.namedtuple(
+    "Row", ["kind", "y", "height", "text", "hours", "color", "event"]
+)
+
+
+def day_title(day, today):
+    if day == today:
+        return f"Today, {day:%a %d %b}"
+    if day == today + datetime.timedelta(days=1):
+        return f"Tomorrow, {day:%a %d %b}"
+    return f"{day:%A %d %b}"
+
+
+def event_hours(event, day_start, day_end):
+    """The event's hours on one day, in local time."""
+    if event.all_day or event.start <= day_start and event.end >= day_end:
+        return "All day"
+    start = max(event.start, day_start).astimezone()
+    end = min(event.end, day_end).astimezone()
+    return f"{start:%H:%M} - {end:%H:%M}"
+
+
+def agenda_rows(index, today, color_for, days=AGENDA_DAYS):
+    """Lay out ``days`` days from ``today`` as Rows, using an EventIndex."""
+    rows = []
+    y = 0
+    for offset in range(days):
+        day = today + datetime.timedelta(days=offset)
+        # Local midnights, so days are right across daylight saving changes
+        day_start = datetime.datetime.combine(day, datetime.time()).astimezone()
+        day_end = datetime.datetime.combine(
+            day + datetime.timedelta(days=1), datetime.time()
+        ).astimezone()
+        title = day_title(day, today)
+        rows.append(Row("day", y, DAY_ROW_HEIGHT, title, None, None, None))
+        y += DAY_ROW_HEIGHT
+        events = index.overlapping(day_start, day_end)
+        for event in events:
+            hours = event_hours(event, day_start, day_end)
+            color = color_for(event)
+            rows.append(
+                Row("event", y, EVENT_ROW_HEIGHT, event.summary, hours, color, event)
+            )
+            y += EVENT_ROW_HEIGHT
+        if not events:
+            rows.append(
+                Row("empty", y, EMPTY_ROW_HEIGHT, "No events", None, None, None)
+            )
+            y += EMPTY_ROW_HEIGHT
+    return rows
+
+
+class RowSlot:
+    """The canvas items of one visible row, reused for whichever row is there."""
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.rect = canvas.create_rectangle(
+            0, 0, 0, 0, outline="", state="hidden", tags="agenda_event"
+        )
+        self.hours = canvas.create_text(
+            0,
+            0,
+            anchor="w",
+            fill="white",
+            font=("Arial", 9),
+            state="hidden",
+            tags="agenda_event",
+        )
+        self.title = canvas.create_text(0, 0, anchor="w", state="hidden")
+        self.row = None
+        self.y = None
+
+    @property
+    def items(self):
+        return self.rect, self.hours, self.title
+
+    def show(self, row, y):
+        """Draw ``row`` with its top at ``y`` in the viewport."""
+        canvas = self.canvas
+        if row is not self.row:
+            self.draw(row)
+            self.row = row
+            self.y = None
+        if y == self.y:
+            return
+        self.y = y
+        if row.kind == "event":
+            canvas.coords(self.rect, 10, y + 3, WIDTH - 10, y + row.height - 5)
+            canvas.coords(self.hours, 25, y + 14)
+            canvas.coords(self.title, 25, y + 30)
+        else:
+            canvas.coords(self.title, 10, y + row.height / 2)
+
+    def draw(self, row):
+        canvas = self.canvas
+        if row.kind == "event":
+            canvas.itemconfig(self.rect, fill=row.color, state="normal")
+            canvas.itemconfig(self.hours, text=row.hours, state="normal")
+            canvas.itemconfig(
+                self.title,
+                text=row.text,
+                fill="white",
+                font=("Arial", 12, "bold"),
+                state="normal",
+            )
+            canvas.addtag_withtag("agenda_event", self.title)
+            return
+        canvas.itemconfig(self.rect, state="hidden")
+        canvas.itemconfig(self.hours, state="hidden")
+        canvas.dtag(self.title, "agenda_event")
+        if row.kind == "day":
+            canvas.itemconfig(
+                self.title,
+                text=row.text,
+                fill="#2c3e50",
+                font=("Arial", 11, "bold"),
+                state="normal",
+            )
+        else:
+            canvas.itemconfig(
+                self.title,
+                text=row.text,
+                fill="#7f8c8d",
+                font=("Arial", 10, "italic"),
+                state="normal",
+            )
+
+    def hide(self):
+        if self.row is not None:
+            for item in self.items:
+                self.canvas.itemconfig(item, state="hidden")
+            self.row = None
+            self.y = None
+
+
+class AgendaWindow(tk.Toplevel):
+    """Today and the coming week in a window of its own.
+
+    ``color_for(event)`` picks the colour of an event's row and ``tooltip``
+    is the app's shared TooltipWindow. Call
+    ``show_index`` with every new EventIndex; the rows are only laid out
+    again when the index or the date changed.
+    """
+
+    def __init__(self, parent, color_for, tooltip):
+        super().__init__(parent)
+        self.title("TimeTab Agenda")
+        self.geometry(f"{WIDTH + 20}x480")
+        self.minsize(WIDTH + 20, 200)
+        self.color_for = color_for
+        self.tooltip = tooltip
+
+        self.canvas = tk.Canvas(self, bg="#ffffff", width=WIDTH, highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.index = None
+        self.today = None
+        self.rows = []
+        self.row_tops = []  # y of every row, for finding the first visible one
+        self.total_height = 0
+        self.top = 0  # Agenda y at the top of the viewport
+        self.slots = []
+        self.slot_items = {}  # Canvas item id -> RowSlot
+
+        self.canvas.bind("<Configure>", lambda _: self.redraw())
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind(sequence, self.on_scroll)
+        self.canvas.tag_bind("agenda_event", "<Enter>", self.on_event_enter)
+        self.canvas.tag_bind("agenda_event", "<Leave>", self.on_event_leave)
+
+    def show_index(self, index):
+        today = datetime.date.today()
+        if index is self.index and today == self.today:
+            return
+        self.index = index
+        self.today = today
+        self.rows = agenda_rows(index, today, self.color_for)
+        self.row_tops = [row.y for row in self.rows]
+        last = self.rows[-1]
+        self.total_height = last.y + last.height
+        # Rows have changed under the slots, so redraw every one of them
+        for slot in self.slots:
+            slot.hide()
+        self.redraw()
+
+    def yview(self, *args):
+        """Scrollbar command: ``moveto fraction`` or ``scroll n units|pages``."""
+        viewport = self.canvas.winfo_height()
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.total_height)
+        elif args[0] == "scroll":
+            step = viewport if args[2] == "pages" else SCROLL_UNIT
+            self.scroll_to(self.top + int(args[1]) * step)
+
+    def on_scroll(self, event):
+        # Windows and macOS send MouseWheel, X11 sends buttons 4 and 5
+        if event.num == 4 or event.delta > 0:
+            self.yview("scroll", -1, "units")
+        else:
+            self.yview("scroll", 1, "units")
+
+    def scroll_to(self, top):
+        viewport = self.canvas.winfo_height()
+        self.top = max(0, min(top, self.total_height - viewport))
+        self.redraw()
+
+    def redraw(self):
+        """Draw the rows in the viewport, recycling the slots of the others."""
+        if not self.rows:
+            return
+        with metrics.timer("render.agenda_ms"):
+            viewport = self.canvas.winfo_height()
+            self.top = max(0, min(self.top, self.total_height - viewport))
+            first = max(bisect.bisect_right(self.row_tops, self.top) - 1, 0)
+            last = bisect.bisect_left(self.row_tops, self.top + viewport)
+            visible = self.rows[first:last]
+
+            # Keep slots on the rows they already show, so scrolling only moves them
+            by_row = {slot.row: slot for slot in self.slots if slot.row in visible}
+            free = [slot for slot in self.slots if slot.row not in by_row]
+            for row in visible:
+                slot = by_row.get(row)
+                if slot is None:
+                    slot = free.pop() if free else self.new_slot()
+                slot.show(row, row.y - self.top)
+            for slot in free:
+                slot.hide()
+
+            if self.total_height > viewport:
+                self.scrollbar.set(
+                    self.top / self.total_height,
+                    (self.top + viewport) / self.total_height,
+                )
+            else:
+                self.scrollbar.set(0, 1)
+
+    def new_slot(self):
+        slot = RowSlot(self.canvas)
+        self.slots.append(slot)
+        for item in slot.items:
+            self.slot_items[item] = slot
+        metrics.observe("render.agenda_slots", len(self.slots))
+        return slot
+
+    def hovered_event(self):
+        items = self.canvas.find_withtag("current")
+        slot = self.slot_items.get(items[0]) if items else None
+        return slot.row.event if slot and slot.row else None
+
+    def on_event_enter(self, tk_event):
+        event = self.hovered_event()
+        if event is None:
+            return
+        x = self.canvas.winfo_rootx() + tk_event.x + 10
+        y = self.canvas.winfo_rooty() + tk_event.y + 10
+        self.tooltip.show(event.tooltip_text, x, y)
+
+    def on_event_leave(self, tk_event):
+        self.tooltip.hide()
@@ -0,0 +1,136 @@
+"""Disk cache for the user's avatar.
+
+The raw image is stored together with its ETag/Last-Modified headers, so it
+can be revalidated with a conditional GET instead of downloaded again. The
+circular PNGs shown in the header are rendered once per display size and
+kept next to it; Tk can load those directly without going through PIL, so
+PIL is only imported when an avatar has to be (re)rendered.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from io import BytesIO
+
+PLACEHOLDER_COLOR = "#2980b9"
+
+
+def create_circular_image(image):
+    from PIL import Image, ImageDraw, ImageOps
+
+    mask = Image.new("L", image.size, 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0, 0) + image.size, fill=255)
+    output = ImageOps.fit(image, mask.size, centering=(0.5, 0.5))
+    output.putalpha(mask)
+    return output
+
+
+class AvatarCache:
+    def __init__(self, cache_dir, transport):
+        self.cache_dir = cache_dir
+        self.transport = transport
+        self.raw_path = os.path.join(cache_dir, "avatar.bin")
+        self.meta_path = os.path.join(cache_dir, "avatar.json")
+        self._lock = threading.Lock()
+
+    def cached_path(self, url, size):
+        """Path of an already rendered avatar for ``url``, or None."""
+        meta = self._read_meta()
+        if meta.get("url") != url:
+            return None
+        path = self._circle_path(meta["digest"], size)
+        return path if os.path.exists(path) else None
+
+    def placeholder(self, size):
+        """Path of a plain circle shown until the real avatar is ready."""
+        path = os.path.join(self.cache_dir, f"placeholder-{size}.png")
+        if not os.path.exists(path):
+            from PIL import Image
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            image = Image.new("RGB", (size, size), color=PLACEHOLDER_COLOR)
+            create_circular_image(image).save(path)
+        return path
+
+    def render(self, url, size):
+        """Revalidate the avatar and return the path of its circular PNG.
+
+        This does network and image work, so call it off the Tk main thread.
+        """
+        with self._lock:
+            digest, content = self._fetch(url)
+            path = self._circle_path(digest, size)
+            if not os.path.exists(path):
+                from PIL import Image
+
+                image = Image.open(BytesIO(content))
+                image = image.resize((size, size), Image.LANCZOS)
+                create_circular_image(image).save(path)
+            return path
+
+    def clear(self):
+        with self._lock:
+            if not os.path.isdir(self.cache_dir):
+                return
+            for name in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def _fetch(self, url):
+        """Return ``(digest, content)`` of the avatar, downloading it only if changed."""
+        meta = self._read_meta()
+        cached = meta.get("url") == url and os.path.exists(self.raw_path)
+        headers = {}
+        if cached:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = self.transport.get(url, headers=headers)
+            if not (cached and response.status_code == 304):
+                response.raise_for_status()
+        except Exception:
+            if not cached:
+                raise
+            # Offline: keep using the copy we already have
+            response = None
+
+        if response is None or response.status_code == 304:
+            with open(self.raw_path, "rb") as raw_file:
+                return meta["digest"], raw_file.read()
+
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()[:16]
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if meta.get("digest") and meta["digest"] != digest:
+            self._remove_circles(meta["digest"])
+        with open(self.raw_path, "wb") as raw_file:
+            raw_file.write(content)
+        meta = {
+            "url": url,
+            "digest": digest,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        with open(self.meta_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+        return digest, content
+
+    def _circle_path(self, digest, size):
+        return os.path.join(self.cache_dir, f"circle-{digest}-{size}.png")
+
+    def _remove_circles(self, digest):
+        prefix = f"circle-{digest}-"
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, "r") as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return {}
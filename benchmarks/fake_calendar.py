@@ -0,0 +1,262 @@
+"""A synthetic, offline stand-in for the Google Calendar ``service`` object.
+
+It implements just the calls the widget makes: ``calendarList().list()``,
+``events().list()`` with paging and sync tokens, ETags with 304 answers,
+and batch requests. The calendars it generates are deliberately hard:
+thousands of events, many of them overlapping, all-day events, and start
+times written in a mix of UTC offsets.
+"""
+
+import datetime
+import itertools
+import random
+
+# Offsets Google may write dateTime values in, including unusual ones
+OFFSETS = [
+    datetime.timedelta(hours=hours, minutes=minutes)
+    for hours, minutes in [
+        (0, 0),
+        (1, 0),
+        (-5, 0),
+        (-8, 0),
+        (5, 30),
+        (5, 45),
+        (6, 0),
+        (9, 30),
+        (-3, -30),
+        (12, 45),
+        (14, 0),
+        (-11, 0),
+    ]
+]
+ALL_DAY_SHARE = 0.1
+UPDATED_EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+# A few of the backgroundColors Google gives calendars
+CALENDAR_COLORS = ["#9fc6e7", "#7bd148", "#f691b2", "#fad165", "#b99aff", "#ff7537"]
+COLOR_IDS = [None, "1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11"]
+
+
+def end_time(item):
+    """An item's end as an aware datetime, to compare against ``timeMin``."""
+    end = item["end"]
+    if "dateTime" in end:
+        return datetime.datetime.fromisoformat(end["dateTime"])
+    day = datetime.date.fromisoformat(end["date"])
+    return datetime.datetime.combine(day, datetime.time()).astimezone()
+
+
+class FakeHttpError(Exception):
+    """Shaped like googleapiclient's HttpError as far as calendar_sync cares."""
+
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Response", (), {"status": status})()
+
+
+class FakeRequest:
+    def __init__(self, execute):
+        self._execute = execute
+        self.headers = {}
+
+    def execute(self):
+        return self._execute(self.headers)
+
+
+class FakeBatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            try:
+                response, exception = request.execute(), None
+            except FakeHttpError as e:
+                response, exception = None, e
+            self.callback(request_id, response, exception)
+
+
+class FakeCalendar:
+    """One calendar's events plus a change log that sync tokens point into."""
+
+    def __init__(self, calendar_id, rng, now, events, days):
+        self.calendar_id = calendar_id
+        self.rng = rng
+        self.now = now
+        self.days = days
+        self.items = {}
+        self.changes = []  # (version, event id), oldest first
+        self.version = 0
+        self._ids = itertools.count()
+        for _ in range(events):
+            self.put(self.generate())
+
+    def generate(self, event_id=None):
+        rng = self.rng
+        if event_id is None:
+            event_id = f"{self.calendar_id}-{next(self._ids)}"
+        # Starts fall on the half hour, so many events overlap
+        start = self.now + datetime.timedelta(days=rng.uniform(-2, self.days))
+        start = start.replace(minute=start.minute // 30 * 30, second=0, microsecond=0)
+        item = {
+            "id": event_id,
+            "status": "confirmed",
+            "summary": f"Event {event_id}",
+            "description": rng.choice([None, "Agenda: " + "x" * rng.randint(10, 200)]),
+            # Unique per edit, so the widget sees edited events as changed
+            "updated": (UPDATED_EPOCH + datetime.timedelta(seconds=self.version))
+            .isoformat()
+            .replace("+00:00", "Z"),
+        }
+        color_id = rng.choice(COLOR_IDS)
+        if color_id:
+            item["colorId"] = color_id
+        if rng.random() < ALL_DAY_SHARE:
+            day = start.date()
+            item["start"] = {"date": day.isoformat()}
+            end = day + datetime.timedelta(days=rng.randint(1, 3))
+            item["end"] = {"date": end.isoformat()}
+        else:
+            offset = datetime.timezone(rng.choice(OFFSETS))
+            end = start + datetime.timedelta(minutes=rng.choice([15, 30, 60, 90, 240]))
+            item["start"] = {"dateTime": start.astimezone(offset).isoformat()}
+            item["end"] = {"dateTime": end.astimezone(offset).isoformat()}
+        return {key: value for key, value in item.items() if value is not None}
+
+    def put(self, item):
+        self.version += 1
+        self.items[item["id"]] = item
+        self.changes.append((self.version, item["id"]))
+
+    def cancel(self, event_id):
+        self.version += 1
+        self.items[event_id] = {"id": event_id, "status": "cancelled"}
+        self.changes.append((self.version, event_id))
+
+    def mutate(self, changes):
+        """Add, edit and cancel ``changes`` events in roughly equal parts."""
+        for _ in range(changes):
+            choice = self.rng.random()
+            live = [
+                event_id
+                for event_id, item in self.items.items()
+                if item["status"] != "cancelled"
+            ]
+            if choice < 0.33 or not live:
+                self.put(self.generate())
+            elif choice < 0.66:
+                self.put(self.generate(self.rng.choice(live)))
+            else:
+                self.cancel(self.rng.choice(live))
+
+    def list(
+        self,
+        sync_token=None,
+        page_token=None,
+        max_results=250,
+        etag=None,
+        time_min=None,
+    ):
+        if sync_token is None:
+            since = 0
+            ids = [
+                event_id
+                for event_id, item in self.items.items()
+                if item["status"] != "cancelled"
+                and (time_min is None or end_time(item) > time_min)
+            ]
+        else:
+            since = int(sync_token.rsplit(":", 1)[1])
+            if since > self.version:
+                raise FakeHttpError(410)
+            if etag is not None and etag == self.etag(self.version):
+                raise FakeHttpError(304)
+            ids = list(dict.fromkeys(eid for v, eid in self.changes if v > since))
+        offset = int(page_token) if page_token else 0
+        page = ids[offset : offset + max_results]
+        response = {"items": [self.items[event_id] for event_id in page]}
+        if offset + max_results < len(ids):
+            response["nextPageToken"] = str(offset + max_results)
+        else:
+            response["nextSyncToken"] = f"{self.calendar_id}:{self.version}"
+            response["etag"] = self.etag(self.version)
+        return response
+
+    def etag(self, version):
+        return f'"{self.calendar_id}-{version}"'
+
+
+class FakeCalendarService:
+    """Drop-in for ``build("calendar", "v3")`` backed by synthetic calendars."""
+
+    def __init__(self, calendars=5, events=1000, days=14, seed=0, now=None):
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        self.rng = random.Random(seed)
+        self.calendars = {
+            f"calendar{number}": FakeCalendar(
+                f"calendar{number}", self.rng, now, events, days
+            )
+            for number in range(calendars)
+        }
+        self.requests = 0
+
+    def mutate(self, changes):
+        """Spread ``changes`` edits over the calendars, as between two syncs."""
+        calendars = list(self.calendars.values())
+        for number in range(changes):
+            calendars[number % len(calendars)].mutate(1)
+
+    def calendarList(self):
+        return _Resource(list=self._calendar_list)
+
+    def events(self):
+        return _Resource(list=self._events_list)
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(callback)
+
+    def _calendar_list(self, **params):
+        def execute(headers):
+            self.requests += 1
+            return {
+                "items": [
+                    {
+                        "id": calendar_id,
+                        "summary": calendar_id,
+                        "backgroundColor": CALENDAR_COLORS[
+                            number % len(CALENDAR_COLORS)
+                        ],
+                        "selected": True,
+                        "primary": number == 0,
+                    }
+                    for number, calendar_id in enumerate(self.calendars)
+                ]
+            }
+
+        return FakeRequest(execute)
+
+    def _events_list(self, calendarId, maxResults=250, **params):
+        calendar = self.calendars[calendarId]
+        time_min = params.get("timeMin")
+        if time_min is not None:
+            time_min = datetime.datetime.fromisoformat(time_min)
+
+        def execute(headers):
+            self.requests += 1
+            return calendar.list(
+                sync_token=params.get("syncToken"),
+                page_token=params.get("pageToken"),
+                max_results=maxResults,
+                etag=headers.get("If-None-Match"),
+                time_min=time_min,
+            )
+
+        return FakeRequest(execute)
+
+
+class _Resource:
+    def __init__(self, **methods):
+        self.__dict__.update(methods)
@@ -0,0 +1,364 @@
+"""Per-operation benchmarks against a synthetic calendar.
+
+Runs the sync, the event index, the event list and the pomodoro tick of
+the widget against FakeCalendarService, and reports the time and memory
+each operation takes.
+Widget operations need a display; on a headless machine run the suite
+under a virtual one:
+
+    xvfb-run python benchmarks/operations.py [--events 1000] [--calendars 8]
+
+Without a display only the operations that do not touch Tk are run.
+
+To catch regressions, save a run with ``--json > baseline.json`` and
+compare later runs against it; the exit status is 1 when an operation got
+slower or allocates more than ``--tolerance`` allows:
+
+    python benchmarks/operations.py --baseline baseline.json [--tolerance 0.25]
+"""
+
+import argparse
+import collections
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_calendar import FakeCalendarService  # noqa: E402
+
+from calendar_events import Event, EventIndex  # noqa: E402
+from calendar_sync import CalendarSync, Snapshot  # noqa: E402
+from pomodoro import PomodoroTimer  # noqa: E402
+
+# Differences below these are noise, however large they are relatively
+TIME_SLACK_MS = 0.05
+MEMORY_SLACK_KIB = 16
+
+Result = collections.namedtuple(
+    "Result", ["name", "runs", "median_ms", "min_ms", "max_ms", "peak_kib", "kept_kib"]
+)
+
+
+def measure(name, operation, runs, setup=None, number=1):
+    """Time ``operation`` over ``runs`` runs, then trace its memory once.
+
+    ``setup`` runs untimed before every run. With ``number`` the operation
+    is repeated that many times per run and timings are per call.
+    """
+    timings = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            operation()
+        timings.append((time.perf_counter() - started) * 1000 / number)
+
+    # Tracing slows everything down, so it gets a run of its own
+    if setup:
+        setup()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    operation()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Result(
+        name,
+        runs,
+        statistics.median(timings),
+        min(timings),
+        max(timings),
+        (peak - before) / 1024,
+        (after - before) / 1024,
+    )
+
+
+def sync_operations(args, now):
+    service = FakeCalendarService(
+        calendars=args.calendars, events=args.events, seed=args.seed, now=now
+    )
+    items = [
+        item
+        for calendar in service.calendars.values()
+        for item in calendar.items.values()
+    ]
+    results = [
+        measure(
+            "Event.from_item (all events)",
+            lambda: [Event.from_item(item) for item in items],
+            args.runs,
+        )
+    ]
+
+    calendar_sync = None
+
+    def new_sync():
+        nonlocal calendar_sync
+        calendar_sync = CalendarSync(service)
+
+    results.append(
+        measure(
+            "CalendarSync.sync full",
+            lambda: calendar_sync.sync(now),
+            min(args.runs, 5),
+            new_sync,
+        )
+    )
+    results.append(
+        measure(
+            f"CalendarSync.sync {args.changes} changes",
+            lambda: calendar_sync.sync(now),
+            args.runs,
+            lambda: service.mutate(args.changes),
+        )
+    )
+    results.append(
+        measure(
+            "CalendarSync.sync unchanged", lambda: calendar_sync.sync(now), args.runs
+        )
+    )
+    return results, calendar_sync.sync(now)
+
+
+def index_operations(args, events, now):
+    index = EventIndex(events)
+    later = now + datetime.timedelta(days=3)
+    return [
+        measure("EventIndex build", lambda: EventIndex(events), args.runs),
+        measure(
+            "EventIndex.active_at",
+            lambda: index.active_at(later),
+            args.runs,
+            number=100,
+        ),
+        measure(
+            "EventIndex.upcoming (next 4)",
+            lambda: index.upcoming(later, 4),
+            args.runs,
+            number=100,
+        ),
+        measure(
+            "EventIndex.next_boundary",
+            lambda: index.next_boundary(later),
+            args.runs,
+            number=100,
+        ),
+    ]
+
+
+def pomodoro_operations(args):
+    timer = PomodoroTimer(focus_minutes=25)
+    timer.start()
+
+    def tick():
+        timer.tick()
+        timer.display()
+        timer.next_tick_delay()
+
+    return [measure("PomodoroTimer tick", tick, args.runs, number=1000)]
+
+
+def widget_operations(args, events, now):
+    import tkinter as tk
+
+    import pomo
+    from avatar_cache import AvatarCache
+    from scheduler import Scheduler
+    from ui_resources import Resources
+
+    class BenchmarkApp(tk.Tk):
+        """The parts of CalendarWidget that CalendarWidgetMain relies on."""
+
+        def __init__(self, config_dir):
+            super().__init__()
+            self.config_dir = config_dir
+            self.scheduler = Scheduler(self)
+            self.resources = Resources(self, self.scheduler)
+            self.user_name = "Benchmark"
+            self.user_image_url = ""
+            self.session_log = None
+            self.avatar_cache = AvatarCache(os.path.join(config_dir, "avatars"), None)
+
+    try:
+        app = BenchmarkApp(tempfile.mkdtemp(prefix="timetab-benchmark-"))
+    except tk.TclError as e:
+        print(f"Skipping widget operations, no display ({e})", file=sys.stderr)
+        return []
+    widget = pomo.CalendarWidgetMain(app)
+    app.update()
+    calendars = {f"calendar{number}": {} for number in range(args.calendars)}
+    snapshot = Snapshot(tuple(events), now, calendars)
+    results = [
+        measure(
+            "CalendarWidgetMain.show_snapshot",
+            lambda: widget.show_snapshot(snapshot),
+            args.runs,
+        )
+    ]
+
+    widget.snapshot = snapshot
+    results.append(
+        measure(
+            "CalendarWidgetMain.get_upcoming_events",
+            widget.get_upcoming_events,
+            args.runs,
+        )
+    )
+
+    def clear_rows():
+        widget.render_event_rows(())
+        widget.events_view_hash = None
+
+    def redraw():
+        widget.update_events()
+        widget.update_idletasks()
+
+    results.append(
+        measure(
+            "CalendarWidgetMain.update_events redraw", redraw, args.runs, clear_rows
+        )
+    )
+    results.append(
+        measure("CalendarWidgetMain.update_events unchanged", redraw, args.runs)
+    )
+
+    event = events[0]
+    drawn = []
+
+    def delete_rectangle():
+        widget.delete_row_items(drawn)
+        drawn.clear()
+
+    results.append(
+        measure(
+            "CalendarWidgetMain.create_event_rectangle",
+            lambda: drawn.extend(widget.create_event_rectangle(event, 10, "#4285F4")),
+            args.runs,
+            delete_rectangle,
+        )
+    )
+
+    widget.show_agenda()
+    app.update()
+    agenda = widget.agenda
+
+    def scroll_agenda():
+        # Page down through the week, then jump back to the top
+        if agenda.top >= agenda.total_height - agenda.canvas.winfo_height():
+            agenda.yview("moveto", 0)
+        else:
+            agenda.yview("scroll", 1, "pages")
+        agenda.update_idletasks()
+
+    results.append(
+        measure("AgendaWindow scroll one page", scroll_agenda, args.runs, number=10)
+    )
+    agenda.destroy()
+
+    def notify():
+        # Three events starting together share one pooled window
+        widget.show_event_start_notifications(events[:3])
+        app.update_idletasks()
+
+    results.append(
+        measure("CalendarWidgetMain notification", notify, args.runs, number=10)
+    )
+
+    widget.pomodoro.start()
+    results.append(
+        measure(
+            "CalendarWidgetMain.update_pomodoro",
+            widget.update_pomodoro,
+            args.runs,
+            number=100,
+        )
+    )
+    widget.pomodoro.stop()
+    app.scheduler.cancel_all()
+    app.destroy()
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """Describe each result that is worse than its baseline beyond ``tolerance``."""
+    saved = {entry["name"]: entry for entry in baseline}
+    found = []
+    for result in results:
+        entry = saved.get(result.name)
+        if entry is None:
+            continue  # New operation, nothing to compare against
+        # The best run is the one least disturbed by the rest of the machine
+        for field, unit, slack in (
+            ("min_ms", "ms", TIME_SLACK_MS),
+            ("peak_kib", "KiB", MEMORY_SLACK_KIB),
+        ):
+            value, before = getattr(result, field), entry[field]
+            if value > before * (1 + tolerance) and value - before > slack:
+                found.append(
+                    f"{result.name}: {field} {value:.3f}{unit}, "
+                    f"baseline {before:.3f}{unit}"
+                )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calendars", type=int, default=8)
+    parser.add_argument("--events", type=int, default=1000, help="per calendar")
+    parser.add_argument("--changes", type=int, default=50, help="per incremental sync")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    parser.add_argument("--baseline", help="JSON of an earlier run to compare with")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="allowed relative slowdown"
+    )
+    args = parser.parse_args()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    results, events = sync_operations(args, now)
+    results += index_operations(args, events, now)
+    results += pomodoro_operations(args)
+    results += widget_operations(args, events, now)
+
+    if args.json:
+        print(json.dumps([result._asdict() for result in results], indent=2))
+    else:
+        print_results(args, results, events)
+    if baseline is None:
+        return 0
+    failures = regressions(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def print_results(args, results, events):
+    print(
+        f"{args.calendars} calendars x {args.events} events, "
+        f"{len(events)} from today on, {args.runs} runs"
+    )
+    print(
+        f"{'operation':44} {'median':>9} {'min':>9} {'max':>9} {'peak':>10} {'kept':>10}"
+    )
+    for result in results:
+        print(
+            f"{result.name:44} {result.median_ms:7.3f}ms {result.min_ms:7.3f}ms "
+            f"{result.max_ms:7.3f}ms {result.peak_kib:7.0f}KiB {result.kept_kib:7.0f}KiB"
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Cold-start benchmark for pomo.py.
+
+Imports pomo in fresh interpreters with ``-X importtime`` and fails when the
+median import time goes over the budget, or when a module that pomo should
+only load on demand is imported before the window exists. Also checks that
+the headless command line does not import Tk.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--budget-ms 100]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds "import pomo" may take, Tk included
+STARTUP_BUDGET_MS = 100
+
+# Modules that must not be loaded until they are actually needed
+LAZY_MODULES = [
+    "PIL",
+    "cryptography",
+    "dotenv",
+    "google",
+    "google_auth_oauthlib",
+    "googleapiclient",
+    "pytz",
+    "requests",
+]
+
+
+def run_python(*args):
+    result = subprocess.run(
+        [sys.executable, *args], cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"python {' '.join(args)} failed:\n{result.stderr}")
+    return result
+
+
+def measure_import():
+    """Return ``(total_ms, modules)`` for one cold ``import pomo``.
+
+    ``modules`` maps every module imported on behalf of pomo to its
+    cumulative import time in milliseconds.
+    """
+    stderr = run_python("-X", "importtime", "-c", "import pomo").stderr
+    modules = {}
+    total_ms = None
+    in_pomo = False
+    for line in reversed(stderr.splitlines()):
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        depth = len(name) - len(name.lstrip())
+        name = name.strip()
+        if depth == 1 and name == "pomo":
+            total_ms = int(cumulative) / 1000
+            in_pomo = True
+        elif depth == 1:
+            in_pomo = False
+        elif in_pomo:
+            modules[name] = int(cumulative) / 1000
+    return total_ms, modules
+
+
+def eager_lazy_modules(module="pomo", lazy_modules=LAZY_MODULES):
+    """Modules from ``lazy_modules`` that are loaded by a plain ``import module``."""
+    code = (
+        f"import sys, {module}; "
+        "print(' '.join(sorted({name.split('.')[0] for name in sys.modules})))"
+    )
+    loaded = set(run_python("-c", code).stdout.split())
+    return [name for name in lazy_modules if name in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    args = parser.parse_args()
+
+    totals = []
+    slowest = {}
+    for _ in range(args.runs):
+        total_ms, modules = measure_import()
+        totals.append(total_ms)
+        for name, ms in modules.items():
+            slowest[name] = max(slowest.get(name, 0), ms)
+    median_ms = statistics.median(totals)
+
+    print(f"import pomo: median {median_ms:.1f} ms over {args.runs} runs")
+    print(f"  min {min(totals):.1f} ms, max {max(totals):.1f} ms")
+    print("slowest imports:")
+    for name, ms in sorted(slowest.items(), key=lambda item: -item[1])[:5]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(
+            f"import took {median_ms:.1f} ms, budget is {args.budget_ms} ms"
+        )
+    eager = eager_lazy_modules()
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    eager = eager_lazy_modules("headless", ["tkinter", *LAZY_MODULES])
+    if eager:
+        failures.append(f"imported by headless: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
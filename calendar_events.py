@@ -0,0 +1,244 @@
+"""Parsed calendar events.
+
+Events are parsed once, when they are fetched, into compact ``Event``
+records. Everything the widget needs on every redraw (aware start and end
+datetimes, the all-day flag, colour and display strings) is computed from
+those, so no ISO string is parsed twice.
+"""
+
+import bisect
+import datetime
+
+# Define the color dictionary
+COLORS = {
+    "1": "#A4BDFC",  # Lavender
+    "2": "#7AE7BF",  # Sage
+    "3": "#DBADFF",  # Grape
+    "4": "#FF887C",  # Flamingo
+    "5": "#FBD75B",  # Banana
+    "6": "#FFB878",  # Tangerine
+    "7": "#46D6DB",  # Peacock
+    "8": "#E1E1E1",  # Graphite
+    "9": "#5484ED",  # Blueberry
+    "10": "#51B749",  # Basil
+    "11": "#DC2127",  # Tomato
+    None: "#000000",  # Default color (white)
+}
+
+# Partial responses: only ask Google for the fields the widget uses
+EVENT_FIELDS = "id,status,summary,description,start,end,updated,colorId"
+EVENT_LIST_FIELDS = f"items({EVENT_FIELDS}),nextPageToken,nextSyncToken,etag"
+CALENDAR_LIST_FIELDS = (
+    "items(id,summary,backgroundColor,selected,primary,deleted),nextPageToken"
+)
+
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def parse_event_time(value):
+    """Parse an event ``start``/``end`` dict into an aware datetime.
+
+    Timed events keep the offset Google sent them with. All-day events only
+    carry a date, which is taken as midnight local time.
+    """
+    stamp = value.get("dateTime", value.get("date"))
+    parsed = datetime.datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return parsed
+
+
+class Event:
+    """One calendar event, parsed once from the Calendar API item."""
+
+    __slots__ = (
+        "id",
+        "calendar_id",
+        "summary",
+        "description",
+        "start",
+        "end",
+        "all_day",
+        "updated",
+        "color_id",
+        "_time_text",
+    )
+
+    def __init__(
+        self,
+        id,
+        calendar_id,
+        summary,
+        description,
+        start,
+        end,
+        all_day=False,
+        updated=None,
+        color_id=None,
+    ):
+        self.id = id
+        self.calendar_id = calendar_id
+        self.summary = summary
+        self.description = description
+        self.start = start
+        self.end = end
+        self.all_day = all_day
+        self.updated = updated
+        self.color_id = color_id
+        self._time_text = None
+
+    @classmethod
+    def from_item(cls, item, calendar_id=None):
+        """Build an Event from an ``events().list`` item or a cached dict."""
+        return cls(
+            item["id"],
+            item.get("calendarId", calendar_id),
+            item.get("summary", "Untitled Event"),
+            item.get("description"),
+            parse_event_time(item["start"]),
+            parse_event_time(item["end"]),
+            all_day="dateTime" not in item["start"],
+            updated=item.get("updated"),
+            color_id=item.get("colorId"),
+        )
+
+    def to_item(self):
+        """The event as a Calendar API style dict, e.g. for caching."""
+        if self.all_day:
+            start = {"date": self.start.date().isoformat()}
+            end = {"date": self.end.date().isoformat()}
+        else:
+            start = {"dateTime": self.start.isoformat()}
+            end = {"dateTime": self.end.isoformat()}
+        item = {"id": self.id, "summary": self.summary, "start": start, "end": end}
+        for key, value in (
+            ("calendarId", self.calendar_id),
+            ("description", self.description),
+            ("updated", self.updated),
+            ("colorId", self.color_id),
+        ):
+            if value is not None:
+                item[key] = value
+        return item
+
+    @property
+    def key(self):
+        """Identify the event; the same event id can appear in several calendars."""
+        return self.calendar_id, self.id
+
+    @property
+    def color(self):
+        """The event's own colour, or None when it uses its calendar's."""
+        return COLORS.get(self.color_id) if self.color_id else None
+
+    @property
+    def time_text(self):
+        if self._time_text is None:
+            self._time_text = (
+                f"{self.start.strftime(TIME_FORMAT)} - {self.end.strftime(TIME_FORMAT)}"
+            )
+        return self._time_text
+
+    @property
+    def tooltip_text(self):
+        description = self.description or "No description available"
+        return f"Summary: {self.summary}\nDescription: {description}"
+
+    def is_current(self, now):
+        return self.start <= now <= self.end
+
+    def __repr__(self):
+        return f"Event({self.id!r}, {self.summary!r}, {self.start.isoformat()})"
+
+
+class EventIndex:
+    """Start-ordered events, indexed to answer time queries in O(log n).
+
+    The events are kept in start order with an implicit balanced tree over
+    them: the node for ``events[lo:hi]`` sits at their middle index and
+    records the latest end in that range. ``active_at`` skips every subtree
+    that ends before ``t``, so it costs O(log n) per event found however
+    many long or overlapping events the calendar has. Times are compared as
+    POSIX timestamps, which is much cheaper than comparing datetimes in
+    different time zones. The index is built once per snapshot.
+    """
+
+    def __init__(self, events):
+        self.events = sorted(events, key=lambda event: event.start.timestamp())
+        self.starts = [event.start.timestamp() for event in self.events]
+        self.ends = [event.end.timestamp() for event in self.events]
+        self.sorted_ends = sorted(self.ends)
+        self.max_ends = [None] * len(self.events)
+        if self.events:
+            self._build(0, len(self.events))
+
+    def __len__(self):
+        return len(self.events)
+
+    def active_at(self, t):
+        """Events happening at ``t``, start and end included, in start order."""
+        stamp = t.timestamp()
+        started = bisect.bisect_right(self.starts, stamp)
+        return self._ending_after(started, stamp, inclusive=True)
+
+    def overlapping(self, start, end):
+        """Events that overlap the range from ``start`` up to ``end``, in start order.
+
+        An event that ends exactly at ``start`` or starts exactly at ``end``
+        does not overlap, so consecutive days never share a meeting.
+        """
+        started = bisect.bisect_left(self.starts, end.timestamp())
+        return self._ending_after(started, start.timestamp(), inclusive=False)
+
+    def upcoming(self, t, limit=None):
+        """The first ``limit`` events starting after ``t``, or all of them."""
+        first = bisect.bisect_right(self.starts, t.timestamp())
+        last = None if limit is None else first + limit
+        return self.events[first:last]
+
+    def split(self, t, limit=None):
+        """``(active_at(t), upcoming(t, limit))``, as the widget shows them."""
+        return self.active_at(t), self.upcoming(t, limit)
+
+    def next_boundary(self, t):
+        """The first time after ``t`` when an event starts or ends, or None."""
+        stamp = t.timestamp()
+        boundaries = []
+        for stamps in (self.starts, self.sorted_ends):
+            position = bisect.bisect_right(stamps, stamp)
+            if position < len(stamps):
+                boundaries.append(stamps[position])
+        if not boundaries:
+            return None
+        return datetime.datetime.fromtimestamp(min(boundaries), datetime.timezone.utc)
+
+    def _ending_after(self, count, stamp, inclusive):
+        """The events among the first ``count`` that end after ``stamp``."""
+        found = []
+        ranges = [(0, len(self.events))]
+        while ranges:
+            lo, hi = ranges.pop()
+            # Skip ranges that start too late or all ended before stamp
+            if lo >= hi or lo >= count:
+                continue
+            mid = (lo + hi) // 2
+            max_end = self.max_ends[mid]
+            if max_end < stamp or max_end == stamp and not inclusive:
+                continue
+            end = self.ends[mid]
+            if mid < count and (end > stamp or end == stamp and inclusive):
+                found.append(mid)
+            ranges.append((lo, mid))
+            ranges.append((mid + 1, hi))
+        return [self.events[position] for position in sorted(found)]
+
+    def _build(self, lo, hi):
+        # Every call halves the range, so the recursion is only log n deep
+        mid = (lo + hi) // 2
+        max_end = self.ends[mid]
+        if lo < mid:
+            max_end = max(max_end, self._build(lo, mid))
+        if mid + 1 < hi:
+            max_end = max(max_end, self._build(mid + 1, hi))
+        self.max_ends[mid] = max_end
+        return max_end
@@ -0,0 +1,499 @@
+"""Incremental Google Calendar sync.
+
+The first sync lists every event from local midnight today onwards. Later
+syncs send the ``nextSyncToken`` returned by the previous one, so Google
+only returns the events that were added, changed or cancelled since. All
+calendars the user has selected in Google Calendar are synced together,
+with one batch request per round trip.
+"""
+
+import collections
+import datetime
+import heapq
+import os
+import random
+import threading
+import time
+
+import metrics
+from calendar_events import CALENDAR_LIST_FIELDS, EVENT_LIST_FIELDS, Event
+
+# Returned for If-None-Match requests when nothing changed since the ETag
+NOT_MODIFIED = 304
+# Google answers 410 Gone when a sync token has expired or was invalidated
+SYNC_TOKEN_GONE = 410
+# Tokens issued before the calendar list scope was added get 403 Forbidden,
+# and quota errors come back as 403 or 429
+FORBIDDEN = 403
+TOO_MANY_REQUESTS = 429
+
+MAX_BATCH_SIZE = 50  # Requests per batch allowed by the Calendar API
+CALENDAR_LIST_INTERVAL = 60 * 60  # Seconds between calendar list refreshes
+
+
+def local_midnight(now):
+    """The local midnight that started the day ``now`` falls in."""
+    midnight = datetime.datetime.combine(now.astimezone().date(), datetime.time())
+    return midnight.astimezone()
+
+
+def full_sync_params(now=None):
+    """Parameters of a full sync: every event that ends after local midnight.
+
+    Without ``timeMin`` a full sync would download the calendar's whole
+    history with every recurring series expanded, only for it to be pruned.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return {"timeMin": local_midnight(now).isoformat()}
+
+
+def http_status(error):
+    """Return the HTTP status of a googleapiclient error, or None."""
+    resp = getattr(error, "resp", None)
+    try:
+        return int(getattr(resp, "status", None))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_quota_error(error):
+    """Whether a googleapiclient error means we are polling too often."""
+    status = http_status(error)
+    if status == TOO_MANY_REQUESTS:
+        return True
+    content = getattr(error, "content", b"") or b""
+    reasons = (b"rateLimitExceeded", b"userRateLimitExceeded", b"quotaExceeded")
+    return status == FORBIDDEN and any(reason in content for reason in reasons)
+
+
+# An immutable view of the stores, handed from the sync worker to the UI.
+# ``calendars`` maps calendar ids to their calendarList entries.
+Snapshot = collections.namedtuple("Snapshot", ["events", "synced_at", "calendars"])
+
+
+class EventStore:
+    """Local copy of a calendar's events, keyed by event id."""
+
+    def __init__(self, calendar_id=None):
+        self.calendar_id = calendar_id
+        self.events = {}  # Event id -> Event
+        self.sync_token = None
+        self.etag = None  # ETag of the last incremental sync that fit one page
+        self._upcoming = None  # Events in start order, until the next change
+
+    def clear(self):
+        self.events.clear()
+        self.sync_token = None
+        self.etag = None
+        self._upcoming = None
+
+    def restore(self, events, sync_token):
+        """Seed the store from a cached copy so syncing can resume incrementally."""
+        self.events = {event.id: event for event in events}
+        self.sync_token = sync_token
+        self._upcoming = None
+
+    def apply(self, items):
+        """Merge a page of events, dropping the ones Google marks cancelled."""
+        # Events are replaced, never mutated, so snapshots can share them
+        if items:
+            self._upcoming = None
+        for item in items:
+            if item.get("status") == "cancelled":
+                self.events.pop(item["id"], None)
+            else:
+                self.events[item["id"]] = Event.from_item(item, self.calendar_id)
+
+    def prune(self, since):
+        """Forget events that ended before ``since``."""
+        ended = [
+            event_id for event_id, event in self.events.items() if event.end < since
+        ]
+        for event_id in ended:
+            del self.events[event_id]
+        if ended and self._upcoming is not None:
+            self._upcoming = [event for event in self._upcoming if event.end >= since]
+
+    def upcoming(self, since):
+        """Events that had not ended by ``since``, ordered by start time.
+
+        The order is kept between syncs, so it is only sorted again after
+        Google reports a change. Callers must not modify the list.
+        """
+        self.prune(since)
+        if self._upcoming is None:
+            self._upcoming = sorted(self.events.values(), key=lambda event: event.start)
+        return self._upcoming
+
+
+class CalendarSync:
+    """Keep one EventStore per calendar up to date using sync tokens.
+
+    Each round trip sends a single batch request holding one
+    ``events().list`` call per calendar that still has pages to fetch.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.stores = {}  # Calendar id -> EventStore
+        self.calendars = {}  # Calendar id -> calendarList entry
+        self.calendars_listed_at = None
+
+    def restore(self, calendars, events, sync_tokens):
+        """Seed the stores from a cached snapshot so syncing resumes incrementally."""
+        self.calendars = dict(calendars)
+        by_calendar = collections.defaultdict(list)
+        for event in events:
+            by_calendar[event.calendar_id].append(event)
+        for calendar_id, token in sync_tokens.items():
+            store = self.stores.setdefault(calendar_id, EventStore(calendar_id))
+            store.restore(by_calendar[calendar_id], token)
+
+    def sync_tokens(self):
+        return {
+            calendar_id: store.sync_token
+            for calendar_id, store in self.stores.items()
+            if store.sync_token
+        }
+
+    def sync(self, now):
+        """Pull changes from every calendar and return today's and later events.
+
+        Events that already ended today are kept for the agenda; what is
+        happening now or next is picked out of them with an EventIndex.
+        """
+        for _ in self.pages():
+            pass
+
+        since = local_midnight(now)
+        return list(
+            heapq.merge(
+                *(store.upcoming(since) for store in self.stores.values()),
+                key=lambda event: event.start,
+            )
+        )
+
+    def pages(self):
+        """Sync every calendar, yielding ``(calendar_id, items)`` per page.
+
+        Pages are yielded as their batch arrives, so a caller can show the
+        first events while ``nextPageToken`` is still being followed for
+        large calendars. The stores are up to date once the generator ends.
+        """
+        if (
+            self.calendars_listed_at is None
+            or time.monotonic() - self.calendars_listed_at > CALENDAR_LIST_INTERVAL
+        ):
+            self.refresh_calendars()
+
+        # Calendar id -> parameters for the next page to fetch
+        pending = {}
+        for calendar_id in self.calendars:
+            store = self.stores.setdefault(calendar_id, EventStore(calendar_id))
+            pending[calendar_id] = self._first_page(store)
+        while pending:
+            pending = yield from self._fetch_pages(pending)
+
+    def calendar_list(self):
+        """Yield the user's calendarList entries, one page at a time."""
+        page_token = None
+        while True:
+            response = (
+                self.service.calendarList()
+                .list(
+                    minAccessRole="reader",
+                    pageToken=page_token,
+                    fields=CALENDAR_LIST_FIELDS,
+                )
+                .execute()
+            )
+            yield from response.get("items", [])
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return
+
+    def refresh_calendars(self):
+        """Find the calendars the user has selected in Google Calendar."""
+        try:
+            calendars = {
+                calendar["id"]: calendar
+                for calendar in self.calendar_list()
+                if calendar.get("selected") and not calendar.get("deleted")
+            }
+        except Exception as e:
+            if http_status(e) != FORBIDDEN or is_quota_error(e):
+                raise
+            # Signed in before the calendar list was requested: primary only
+            calendars = {"primary": {"id": "primary", "primary": True}}
+
+        self.calendars = calendars
+        self.calendars_listed_at = time.monotonic()
+        for calendar_id in list(self.stores):
+            if calendar_id not in calendars:
+                del self.stores[calendar_id]
+
+    def _first_page(self, store):
+        if store.sync_token:
+            return {"syncToken": store.sync_token}
+        store.clear()
+        return full_sync_params()
+
+    def _fetch_pages(self, pending):
+        """Fetch one page per pending calendar in a single batch request.
+
+        Yields ``(calendar_id, items)`` for every page received and returns
+        the parameters of the pages still to fetch.
+        """
+        results = {}
+
+        def on_response(request_id, response, exception):
+            results[request_id] = (response, exception)
+
+        batch = self.service.new_batch_http_request(callback=on_response)
+        calendar_ids = list(pending)[:MAX_BATCH_SIZE]
+        for calendar_id in calendar_ids:
+            params = pending[calendar_id]
+            request = self.service.events().list(
+                calendarId=calendar_id,
+                singleEvents=True,
+                maxResults=250,
+                fields=EVENT_LIST_FIELDS,
+                **params,
+            )
+            etag = self.stores[calendar_id].etag
+            if etag and "syncToken" in params and "pageToken" not in params:
+                # Unchanged calendars then answer with an empty 304
+                request.headers["If-None-Match"] = etag
+            batch.add(request, request_id=calendar_id)
+        batch.execute()
+
+        next_pending = {
+            calendar_id: params
+            for calendar_id, params in pending.items()
+            if calendar_id not in results
+        }
+        errors = []
+        for calendar_id, (response, exception) in results.items():
+            store = self.stores[calendar_id]
+            if exception is not None:
+                status = http_status(exception)
+                if status == NOT_MODIFIED:
+                    continue  # Nothing changed, the current token stays valid
+                if status == SYNC_TOKEN_GONE:
+                    # The token is no longer valid, start over with a full sync
+                    store.clear()
+                    next_pending[calendar_id] = full_sync_params()
+                else:
+                    # Keep the old token so these changes are fetched next time
+                    print(f"Error syncing calendar {calendar_id}: {exception}")
+                    errors.append(exception)
+                continue
+
+            params = pending[calendar_id]
+            items = response.get("items", [])
+            store.apply(items)
+            page_token = response.get("nextPageToken")
+            if page_token:
+                # Later pages repeat the syncToken or timeMin of the first one
+                next_pending[calendar_id] = dict(params, pageToken=page_token)
+            else:
+                # The sync token is only returned on the last page
+                store.sync_token = response.get("nextSyncToken")
+                single_page = "pageToken" not in params
+                store.etag = response.get("etag") if single_page else None
+            yield calendar_id, items
+
+        # Let the caller back off when every calendar failed, e.g. over quota
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        return next_pending
+
+
+class PollPolicy:
+    """Decide how long to wait before the next sync.
+
+    Polls at ``min_interval`` shortly before an event starts, stretches
+    towards ``max_interval`` when the next event is far away or during the
+    night, and backs off exponentially, with jitter, after failed syncs.
+    """
+
+    def __init__(
+        self,
+        min_interval=30,
+        max_interval=600,
+        lead_time=15 * 60,
+        quiet_hours=(22, 6),
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.lead_time = lead_time  # Poll fastest this many seconds before events
+        self.quiet_hours = quiet_hours  # Local (start, end) hours to poll slowly
+        self.failures = 0
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+
+    def next_interval(self, events, now):
+        """Seconds until the next sync, given the time-ordered upcoming events."""
+        if self.failures:
+            return self.backoff()
+
+        next_start = None
+        for event in events:
+            if event.start > now:
+                next_start = event.start
+                break
+        if next_start is None:
+            return self.max_interval
+
+        until_start = (next_start - now).total_seconds()
+        if until_start <= self.lead_time:
+            return self.min_interval
+        if self.is_quiet_hour(now.astimezone().hour):
+            return self.max_interval
+        # Look again a few times before the next event starts
+        return min(max(until_start / 4, self.min_interval), self.max_interval)
+
+    def backoff(self):
+        """Exponential backoff with equal jitter, capped at ``max_interval``."""
+        ceiling = min(self.min_interval * 2**self.failures, self.max_interval)
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def is_quiet_hour(self, hour):
+        start, end = self.quiet_hours
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+
+class SyncWorker(threading.Thread):
+    """Run calendar syncs on a background thread.
+
+    The worker owns the CalendarSync, and with it the Google service object,
+    so no API call ever runs on the Tk main thread. Every completed sync is
+    passed to ``on_snapshot`` as an immutable Snapshot; the callback runs on
+    the worker thread and must hand the snapshot over to the UI itself.
+
+    With ``interval=None`` the worker only syncs when ``request_sync`` is
+    called, which lets the caller's scheduler decide when to poll. Failed
+    syncs are reported to ``on_error``, also on the worker thread.
+    """
+
+    def __init__(
+        self, calendar_sync, on_snapshot, interval=60, cache=None, on_error=None
+    ):
+        super().__init__(daemon=True)
+        self.calendar_sync = calendar_sync
+        self.on_snapshot = on_snapshot
+        self.on_error = on_error
+        self.interval = interval
+        self.cache = cache
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def request_sync(self):
+        """Sync now instead of waiting for the next interval."""
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                snapshot = self.sync_once()
+            except Exception as e:
+                print(f"Error syncing events: {e}")
+                if self.on_error and not self._stopped.is_set():
+                    self.on_error(e)
+            else:
+                if not self._stopped.is_set():
+                    self.on_snapshot(snapshot)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def sync_once(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with metrics.timer("sync.duration_ms"):
+            events = self.calendar_sync.sync(now)
+        metrics.observe("sync.events", len(events))
+        snapshot = Snapshot(tuple(events), now, dict(self.calendar_sync.calendars))
+        if self.cache:
+            self.cache.save_sync(self.calendar_sync, events)
+        return snapshot
+
+
+class SnapshotCache:
+    """The last known profile and events, persisted between launches.
+
+    The widget paints from this cache before Google has answered, and keeps
+    showing it while offline. The file is encrypted with the same Encryptor
+    as the OAuth token.
+    """
+
+    def __init__(self, path, encryptor):
+        self.path = path
+        self.encryptor = encryptor
+        self.data = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Return the cached fields, or an empty dict if there is no usable cache."""
+        with self._lock:
+            if self.data is None:
+                self.data = self._read()
+            return dict(self.data)
+
+    def snapshot(self):
+        """The cached events as a Snapshot, or None if nothing is cached."""
+        data = self.load()
+        if "events" not in data:
+            return None
+        events = tuple(Event.from_item(item) for item in data["events"])
+        # synced_at is None for snapshots that were read from disk
+        return Snapshot(events, None, data.get("calendars", {}))
+
+    def save(self, **fields):
+        """Merge ``fields`` into the cache, writing the file only if it changed."""
+        with self._lock:
+            if self.data is None:
+                self.data = self._read()
+            data = dict(self.data, **fields)
+            if data == self.data:
+                return
+            encrypted = self.encryptor.encrypt(data)
+            # Write to a temporary file first so a crash never leaves half a
+            # cache; it is per process, as the widget and headless share the cache
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as cache_file:
+                cache_file.write(encrypted)
+            os.replace(tmp_path, self.path)
+            self.data = data
+
+    def save_sync(self, calendar_sync, events):
+        """Save the result of ``calendar_sync.sync`` so the next sync resumes it."""
+        self.save(
+            events=[event.to_item() for event in events],
+            calendars=dict(calendar_sync.calendars),
+            sync_tokens=calendar_sync.sync_tokens(),
+        )
+
+    def clear(self):
+        with self._lock:
+            self.data = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as cache_file:
+                return self.encryptor.decrypt(cache_file.read())
+        except Exception as e:
+            print(f"Error loading cache: {e}")
+            return {}
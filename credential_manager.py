@@ -0,0 +1,168 @@
+"""Keep the OAuth token fresh without ever refreshing on a request's time.
+
+The token is refreshed by a background thread a few minutes before it
+expires, well ahead of the point where google-auth would refresh it inside
+a request. Refreshes are serialised by a lock, so callers that need a valid
+token at the same time share one refresh. ``token.enc`` is rewritten
+atomically, and only when the token actually changed.
+"""
+
+import datetime
+import os
+import threading
+
+import metrics
+
+# Refresh this long before expiry; google-auth itself refreshes at 3m45s
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+RETRY_DELAY = 60  # Seconds to wait after a failed refresh
+
+
+class CredentialManager:
+    def __init__(self, path, encryptor, scopes, transport=None, on_revoked=None):
+        self.path = path
+        self.encryptor = encryptor
+        self.scopes = scopes
+        self.transport = transport
+        self.on_revoked = on_revoked
+        self.credentials = None
+        self.saved = None  # Token data as last written to path
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Read the stored token, or return None and forget it if it is unusable."""
+        from google.oauth2.credentials import Credentials
+
+        with self._lock:
+            try:
+                with open(self.path, "r") as token_file:
+                    token_data = self.encryptor.decrypt(token_file.read())
+                self.credentials = Credentials.from_authorized_user_info(
+                    token_data, self.scopes
+                )
+                self.saved = token_data
+            except Exception as e:
+                print(f"Error loading credentials: {e}")
+                self.credentials = None
+                self._remove()
+            return self.credentials
+
+    def set(self, credentials):
+        """Adopt freshly issued credentials, e.g. from the sign-in flow."""
+        with self._lock:
+            self.credentials = credentials
+            self._save()
+        self._wake.set()
+
+    def refresh(self, force=False):
+        """Return the credentials, refreshing them first if they are about to expire.
+
+        Raises google.auth's RefreshError when the refresh token was revoked.
+        """
+        from google.auth.transport.requests import Request
+
+        with self._lock:
+            credentials = self.credentials
+            if credentials is not None and (force or self._needs_refresh()):
+                session = self.transport.session if self.transport else None
+                try:
+                    with metrics.timer("auth.token_refresh_ms"):
+                        credentials.refresh(Request(session))
+                except Exception:
+                    metrics.increment("auth.token_refresh_errors")
+                    raise
+                metrics.increment("auth.token_refreshes")
+                self._save()
+            return credentials
+
+    def start(self):
+        """Start refreshing in the background; does nothing if already running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def clear(self):
+        """Stop refreshing and delete the stored token, e.g. on logout."""
+        self.stop()
+        with self._lock:
+            self.credentials = None
+            self._remove()
+
+    def _run(self):
+        from google.auth.exceptions import RefreshError
+
+        while not self._stopped.is_set():
+            delay = self._seconds_until_refresh()
+            if delay > 0:
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+            try:
+                self.refresh()
+            except RefreshError as e:
+                print(f"Error refreshing credentials: {e}")
+                if self.on_revoked:
+                    self.on_revoked()
+                return
+            except Exception as e:
+                # Probably offline; the current token may still have minutes left
+                print(f"Error refreshing credentials: {e}")
+                self._stopped.wait(RETRY_DELAY)
+
+    def _needs_refresh(self):
+        credentials = self.credentials
+        if not credentials.token or credentials.expiry is None:
+            return True  # Token files written before expiry was stored
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return credentials.expiry - REFRESH_MARGIN <= now
+
+    def _seconds_until_refresh(self):
+        with self._lock:
+            credentials = self.credentials
+            if credentials is None:
+                return RETRY_DELAY  # Nothing to refresh until set() wakes us
+            if self._needs_refresh():
+                return 0
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            return (credentials.expiry - REFRESH_MARGIN - now).total_seconds()
+
+    def _save(self):
+        credentials = self.credentials
+        token_data = {
+            "token": credentials.token,
+            "refresh_token": credentials.refresh_token,
+            "token_uri": credentials.token_uri,
+            "client_id": credentials.client_id,
+            "client_secret": credentials.client_secret,
+            "scopes": credentials.scopes,
+        }
+        if credentials.expiry is not None:
+            token_data["expiry"] = credentials.expiry.isoformat() + "Z"
+        if token_data == self.saved:
+            return
+        encrypted = self.encryptor.encrypt(token_data)
+        # Write to a temporary file first so a crash never leaves half a token;
+        # it is per process, as the widget and headless share the token
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as token_file:
+            token_file.write(encrypted)
+        os.replace(tmp_path, self.path)
+        self.saved = token_data
+
+    def _remove(self):
+        self.saved = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
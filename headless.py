@@ -0,0 +1,244 @@
+"""TimeTab from the terminal, for status bars, cron jobs and shell prompts.
+
+    python pomo.py --headless now          # events happening right now
+    python pomo.py --headless next         # the next event to start
+    python pomo.py --headless focus 25     # a 25 minute focus session
+    python pomo.py --headless stats        # focus time today and this week
+    python pomo.py --headless --json now   # the same, as JSON
+
+Uses the token, cache and settings of the widget, so sign in with the
+widget once first. Neither Tk nor PIL is imported, and the Google client
+is only loaded when the calendar has to be synced.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+from calendar_events import EventIndex
+from calendar_sync import CalendarSync, SnapshotCache
+from credential_manager import CredentialManager
+from pomodoro import PomodoroTimer
+from session_log import SessionLog
+from settings import (
+    SCOPES,
+    create_transport,
+    get_config_path,
+    load_encryptor,
+)
+
+
+def event_json(event):
+    return {
+        "id": event.id,
+        "calendarId": event.calendar_id,
+        "summary": event.summary,
+        "start": event.start.isoformat(),
+        "end": event.end.isoformat(),
+        "allDay": event.all_day,
+    }
+
+
+def event_line(event):
+    start = event.start.astimezone()
+    end = event.end.astimezone()
+    if event.all_day:
+        return f"{start:%Y-%m-%d} {event.summary}"
+    return f"{start:%H:%M}-{end:%H:%M} {event.summary}"
+
+
+def load_events(config_dir, offline=False):
+    """Sync the calendar and return its events, or the cached ones when offline."""
+    encryptor = load_encryptor()
+    cache = SnapshotCache(os.path.join(config_dir, "cache.enc"), encryptor)
+    snapshot = cache.snapshot()
+    if offline:
+        if snapshot is None:
+            print("No cached events; run TimeTab online once first", file=sys.stderr)
+            return None
+        return snapshot.events
+
+    credentials = CredentialManager(
+        os.path.join(config_dir, "token.enc"),
+        encryptor,
+        SCOPES,
+        transport=create_transport(),
+    )
+    try:
+        if not credentials.exists() or credentials.load() is None:
+            print(
+                "Not signed in; sign in with the TimeTab window first", file=sys.stderr
+            )
+            return None
+
+        from googleapiclient.discovery import build
+
+        credentials.refresh()
+        http = credentials.transport.authorized(credentials)
+        service = build("calendar", "v3", http=http)
+        calendar_sync = CalendarSync(service)
+        cached = cache.load()
+        calendar_sync.restore(
+            cached.get("calendars", {}),
+            snapshot.events if snapshot else (),
+            cached.get("sync_tokens", {}),
+        )
+        events = calendar_sync.sync(datetime.datetime.now(datetime.timezone.utc))
+        # Save through the widget's cache so both resume the same sync
+        cache.save_sync(calendar_sync, events)
+        return events
+    except Exception as e:
+        print(f"Error syncing calendar: {e}", file=sys.stderr)
+        # Offline: answer from the last sync
+        return snapshot.events if snapshot else None
+
+
+def show_now(events, now, as_json):
+    current_events = EventIndex(events).active_at(now)
+    if as_json:
+        print(json.dumps([event_json(event) for event in current_events]))
+    elif current_events:
+        for event in current_events:
+            print(event_line(event))
+    else:
+        print("No current events")
+
+
+def show_next(events, now, as_json):
+    upcoming_events = EventIndex(events).upcoming(now, limit=1)
+    event = upcoming_events[0] if upcoming_events else None
+    if as_json:
+        print(json.dumps(event_json(event) if event else None))
+    elif event:
+        minutes = max(round((event.start - now).total_seconds() / 60), 0)
+        print(f"{event_line(event)} (in {minutes} min)")
+    else:
+        print("No upcoming events")
+
+
+def open_session_log(config_dir):
+    try:
+        os.makedirs(config_dir, exist_ok=True)
+        return SessionLog(os.path.join(config_dir, "sessions.db"))
+    except Exception as e:
+        print(f"Error opening the focus session log: {e}", file=sys.stderr)
+        return None
+
+
+def log_focus_session(session_log, timer, completed):
+    if session_log is None:
+        return
+    try:
+        session_log.record(timer.started_at, timer.focus_minutes * 60, completed)
+    except Exception as e:
+        print(f"Error logging focus session: {e}", file=sys.stderr)
+
+
+def show_stats(session_log, as_json):
+    today = datetime.date.today()
+    if as_json:
+        week_ago = today - datetime.timedelta(days=6)
+        stats = {
+            "today": session_log.day_totals(today)._asdict(),
+            "week": session_log.week_totals(today)._asdict(),
+            "days": {
+                day.isoformat(): totals._asdict()
+                for day, totals in session_log.daily_totals(week_ago, today)
+            },
+        }
+        print(json.dumps(stats))
+    else:
+        print(session_log.summary(today))
+
+
+def run_focus(minutes, as_json, session_log=None):
+    """Count a focus session down in the terminal; Ctrl+C stops it."""
+    timer = PomodoroTimer(focus_minutes=minutes)
+    timer.start()
+    ends_at = datetime.datetime.now().astimezone() + datetime.timedelta(minutes=minutes)
+    # Redraw in place on a terminal; pipes and JSON only get start and end
+    live = sys.stdout.isatty() and not as_json
+    if as_json:
+        print(
+            json.dumps(
+                {"focus": "started", "minutes": minutes, "ends": ends_at.isoformat()}
+            )
+        )
+    else:
+        print(f"Focus for {minutes} minutes, until {ends_at:%H:%M}")
+    sys.stdout.flush()
+    try:
+        while not timer.tick():
+            if live:
+                print(f"\r{timer.display()} ", end="", flush=True)
+            time.sleep(timer.next_tick_delay())
+    except KeyboardInterrupt:
+        log_focus_session(session_log, timer, completed=False)
+        if as_json:
+            print(
+                json.dumps({"focus": "stopped", "remaining": round(timer.remaining())})
+            )
+        else:
+            print(f"\nStopped with {timer.display()} left")
+        return 130
+    log_focus_session(session_log, timer, completed=True)
+    if as_json:
+        print(json.dumps({"focus": "finished", "minutes": minutes}))
+    else:
+        print("\r\aFocus session complete! Time for a break.")
+    return 0
+
+
+def main(argv=None):
+    # Accept the options before or after the command
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument(
+        "--json", action="store_true", default=argparse.SUPPRESS, help="print JSON"
+    )
+    options.add_argument(
+        "--offline",
+        action="store_true",
+        default=argparse.SUPPRESS,
+        help="answer from the cache without syncing",
+    )
+    parser = argparse.ArgumentParser(
+        prog="pomo.py --headless",
+        description="TimeTab without the window.",
+        parents=[options],
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("now", parents=[options], help="events happening right now")
+    commands.add_parser("next", parents=[options], help="the next event to start")
+    focus = commands.add_parser("focus", parents=[options], help="run a focus session")
+    focus.add_argument("minutes", type=int, nargs="?", default=25)
+    commands.add_parser("stats", parents=[options], help="focus time logged")
+    args = parser.parse_args(argv)
+    as_json = getattr(args, "json", False)
+
+    if args.command == "focus":
+        if args.minutes < 1:
+            parser.error("focus needs at least 1 minute")
+        return run_focus(args.minutes, as_json, open_session_log(get_config_path()))
+    if args.command == "stats":
+        session_log = open_session_log(get_config_path())
+        if session_log is None:
+            return 1
+        show_stats(session_log, as_json)
+        return 0
+
+    events = load_events(get_config_path(), offline=getattr(args, "offline", False))
+    if events is None:
+        return 1
+    now = datetime.datetime.now(datetime.timezone.utc)
+    if args.command == "now":
+        show_now(events, now, as_json)
+    else:
+        show_next(events, now, as_json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
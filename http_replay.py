@@ -0,0 +1,314 @@
+"""Record real API exchanges and replay them without a network.
+
+``RecordingTransport`` passes requests through to the network and appends
+every exchange to a JSON fixture. The fixture is sanitized on the way in:
+bearer tokens are dropped, event titles, descriptions and names are
+replaced, e-mail addresses (which double as calendar ids) are mapped to
+``userN@example.com``, the Google account id in the userinfo response is
+replaced, and the avatar is swapped for a blank image. Event and calendar
+ids and sync tokens are kept, so a replayed sync still lines up.
+
+``ReplayTransport`` answers from such a fixture. Exchanges are served in
+the order they were recorded, per method and URL, and the last one repeats
+once they run out, so polling keeps working. Latency, connection errors,
+``410 Gone`` sync tokens and ``429`` quota errors can be injected to
+reproduce slow networks and quota trouble. Token refreshes are answered
+locally, so a replay never needs the network.
+
+Both plug into the app through ``settings.create_transport()``.
+"""
+
+import base64
+import collections
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+from http_transport import HttpTransport
+
+FIXTURE_VERSION = 1
+# OAuth endpoints are never recorded; their exchanges hold the secrets
+TOKEN_HOSTS = ("oauth2.googleapis.com", "accounts.google.com")
+KEPT_HEADERS = ("content-type", "etag", "last-modified")
+# A 1x1 PNG that stands in for the recorded avatar
+BLANK_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+EMAIL = re.compile(r"[\w.+-]+(?:@|%40)[\w-]+(?:\.[\w-]+)+")
+BEARER = re.compile(r"Bearer [\w.~+/=-]+")
+PRIVATE_FIELD = re.compile(
+    r'"(summary|description|location|name|given_name|family_name|picture)"'
+    r'(\s*:\s*)"((?:[^"\\]|\\.)*)"'
+)
+# The account id; only replaced in userinfo, as event ids must survive
+ACCOUNT_ID = re.compile(r'"id"(\s*:\s*)"((?:[^"\\]|\\.)*)"')
+SECRET_PARAMS = ("access_token", "key")
+
+
+class Sanitizer:
+    """Replace private values consistently across URLs and bodies."""
+
+    def __init__(self):
+        self.replacements = {}  # Original value -> stand-in
+        self.counters = collections.Counter()
+
+    def text(self, text, userinfo=False):
+        if userinfo:
+            text = ACCOUNT_ID.sub(self._account_id, text)
+        text = PRIVATE_FIELD.sub(self._field, text)
+        text = EMAIL.sub(self._email, text)
+        return BEARER.sub("Bearer REDACTED", text)
+
+    def url(self, url):
+        url = strip_secrets(self.replacements.get(url, url))
+        return EMAIL.sub(self._email, url)
+
+    def _stand_in(self, kind, original, template):
+        if original not in self.replacements:
+            self.counters[kind] += 1
+            self.replacements[original] = template.format(self.counters[kind])
+        return self.replacements[original]
+
+    def _field(self, match):
+        field, separator, value = match.groups()
+        if field == "picture":
+            stand_in = self._stand_in(field, value, "https://avatar.invalid/{}.png")
+        elif field in ("name", "given_name", "family_name"):
+            stand_in = self._stand_in(field, value, "Test User {}")
+        else:
+            stand_in = self._stand_in(field, value, field.title() + " {}")
+        return f'"{field}"{separator}"{stand_in}"'
+
+    def _account_id(self, match):
+        separator, value = match.groups()
+        stand_in = self._stand_in("account", value, "10000000000000000000{}")
+        return f'"id"{separator}"{stand_in}"'
+
+    def _email(self, match):
+        email = match.group()
+        encoded = "%40" in email
+        stand_in = self._stand_in(
+            "email", email.replace("%40", "@"), "user{}@example.com"
+        )
+        return stand_in.replace("@", "%40") if encoded else stand_in
+
+
+def strip_secrets(url):
+    parts = urllib.parse.urlsplit(url)
+    query = [
+        (name, value)
+        for name, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if name not in SECRET_PARAMS
+    ]
+    return parts._replace(query=urllib.parse.urlencode(query)).geturl()
+
+
+def load_fixture(path):
+    with open(path, "r") as fixture_file:
+        fixture = json.load(fixture_file)
+    if fixture.get("version") != FIXTURE_VERSION:
+        raise ValueError(f"Unsupported fixture version in {path}")
+    return fixture["exchanges"]
+
+
+def is_token_request(url):
+    return urllib.parse.urlsplit(url).netloc in TOKEN_HOSTS
+
+
+def is_userinfo_request(url):
+    return urllib.parse.urlsplit(url).path.endswith("/userinfo")
+
+
+def exchange_key(method, url):
+    return f"{method} {url}"
+
+
+class RecordingSession:
+    """Wraps a requests.Session and saves every exchange to ``path``."""
+
+    def __init__(self, session, path):
+        self.session = session
+        self.path = path
+        self.sanitizer = Sanitizer()
+        self.exchanges = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        response = self.session.request(method, url, **kwargs)
+        if not is_token_request(url):
+            self.record(method, url, response)
+        return response
+
+    def record(self, method, url, response):
+        headers = {
+            name: response.headers[name]
+            for name in KEPT_HEADERS
+            if name in response.headers
+        }
+        exchange = {"status": response.status_code, "reason": response.reason}
+        content_type = headers.get("content-type", "")
+        with self._lock:
+            exchange["method"] = method
+            exchange["url"] = self.sanitizer.url(url)
+            if content_type.startswith("image/"):
+                exchange["body_base64"] = base64.b64encode(BLANK_PNG).decode()
+                headers["content-type"] = "image/png"
+            else:
+                exchange["body"] = self.sanitizer.text(
+                    response.text, userinfo=is_userinfo_request(url)
+                )
+            exchange["headers"] = headers
+            self.exchanges.append(exchange)
+            self._save()
+
+    def close(self):
+        self.session.close()
+
+    def _save(self):
+        fixture = {"version": FIXTURE_VERSION, "exchanges": self.exchanges}
+        # Write to a temporary file first so a crash never leaves half a fixture
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as fixture_file:
+            json.dump(fixture, fixture_file, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class ReplaySession:
+    """Answers requests from a recorded fixture instead of the network.
+
+    ``latency`` seconds (plus up to ``jitter`` more) are added to every
+    request. ``error_rate`` of the requests fail to connect, ``quota_rate``
+    are answered with 429, and in incremental syncs ``gone_rate`` of the
+    calendars are told their sync token expired.
+    """
+
+    def __init__(
+        self,
+        path,
+        latency=0,
+        jitter=0,
+        error_rate=0,
+        quota_rate=0,
+        gone_rate=0,
+        seed=None,
+        sleep=time.sleep,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.gone_rate = gone_rate
+        self.sleep = sleep
+        self.random = random.Random(seed)
+        self.exchanges = collections.defaultdict(list)  # Key -> exchanges left
+        for exchange in load_fixture(path):
+            key = exchange_key(exchange["method"], exchange["url"])
+            self.exchanges[key].append(exchange)
+        self._lock = threading.Lock()
+
+    def request(self, method, url, data=None, **kwargs):
+        import requests
+
+        with self._lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fails = self.random.random() < self.error_rate
+            over_quota = self.random.random() < self.quota_rate
+        if delay:
+            self.sleep(delay)
+        if fails:
+            raise requests.ConnectionError(f"Injected connection error for {url}")
+        if is_token_request(url):
+            return self._response(url, 200, self._token_body())
+        if over_quota:
+            return self._response(url, 429, self._error_body(429, "rateLimitExceeded"))
+
+        exchange = self._next_exchange(method, url)
+        if exchange is None:
+            print(f"No recorded response for {method} {url}")
+            return self._response(url, 404, self._error_body(404, "notFound"))
+        if "body_base64" in exchange:
+            body = base64.b64decode(exchange["body_base64"])
+        else:
+            body = exchange["body"].encode()
+            if self.gone_rate and data and b"syncToken" in _as_bytes(data):
+                body = self._expire_sync_tokens(body)
+        return self._response(
+            url, exchange["status"], body, exchange["headers"], exchange.get("reason")
+        )
+
+    def close(self):
+        pass
+
+    def _next_exchange(self, method, url):
+        # Replayed URLs already carry the stand-ins from the fixture
+        key = exchange_key(method, strip_secrets(url))
+        with self._lock:
+            exchanges = self.exchanges.get(key)
+            if not exchanges:
+                return None
+            # Serve in recorded order, then keep repeating the last one
+            return exchanges.pop(0) if len(exchanges) > 1 else exchanges[0]
+
+    def _expire_sync_tokens(self, body):
+        """Turn some successful parts of a batch response into 410 Gone."""
+        parts = body.split(b"HTTP/1.1 200 OK")
+        with self._lock:
+            statuses = [
+                (
+                    b"HTTP/1.1 410 Gone"
+                    if self.random.random() < self.gone_rate
+                    else b"HTTP/1.1 200 OK"
+                )
+                for _ in parts[1:]
+            ]
+        expired = parts[0]
+        for status, part in zip(statuses, parts[1:]):
+            expired += status + part
+        return expired
+
+    def _response(self, url, status, body, headers=None, reason=None):
+        import requests
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = reason or ("OK" if status < 400 else "Injected")
+        response.url = url
+        response.headers.update(headers or {"content-type": "application/json"})
+        response._content = body
+        return response
+
+    def _token_body(self):
+        token = {"access_token": "replay", "expires_in": 3600, "token_type": "Bearer"}
+        return json.dumps(token).encode()
+
+    def _error_body(self, status, reason):
+        error = {"error": {"code": status, "errors": [{"reason": reason}]}}
+        return json.dumps(error).encode()
+
+
+def _as_bytes(data):
+    return data.encode() if isinstance(data, str) else data
+
+
+class RecordingTransport(HttpTransport):
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def _create_session(self):
+        return RecordingSession(super()._create_session(), self.path)
+
+
+class ReplayTransport(HttpTransport):
+    def __init__(self, path, replay_options=None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.replay_options = replay_options or {}
+
+    def _create_session(self):
+        return ReplaySession(self.path, **self.replay_options)
@@ -0,0 +1,224 @@
+"""One pooled HTTP transport for every outbound call.
+
+The calendar, userinfo and avatar requests all go through a single
+``requests.Session``. Its connections, and their TLS sessions, stay alive
+between refreshes instead of being set up again every time. Every request
+has connect and read timeouts, so a dead connection fails instead of
+hanging a worker thread, and server errors and dropped connections are
+retried. The time taken by each request is recorded per host.
+"""
+
+import collections
+import queue
+import threading
+import time
+import urllib.parse
+
+CONNECT_TIMEOUT = 5  # Seconds to wait for a connection
+READ_TIMEOUT = 30  # Seconds to wait for the server to answer
+RETRIES = 2
+POOL_SIZE = 4  # Connections kept alive per host
+# Quota errors (403/429) are not retried here; PollPolicy backs off instead
+RETRY_STATUSES = (500, 502, 503, 504)
+UNAUTHORIZED = 401
+
+HostStats = collections.namedtuple(
+    "HostStats", ["requests", "errors", "seconds", "slowest", "bytes"]
+)
+
+
+class RequestPool:
+    """A bounded set of daemon threads running fire-and-forget requests.
+
+    ThreadPoolExecutor workers are joined at interpreter exit, so a request
+    stuck until its read timeout would keep the process alive after the
+    window closed. These threads are daemons and die with the app.
+    """
+
+    def __init__(self, workers, name="timetab-request"):
+        self.workers = workers
+        self.name = name
+        self._tasks = queue.SimpleQueue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args):
+        self._tasks.put((function, args))
+        with self._lock:
+            # Threads are started as work arrives, up to ``workers`` of them
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._run,
+                    name=f"{self.name}-{len(self._threads)}",
+                    daemon=True,
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def _run(self):
+        while True:
+            function, args = self._tasks.get()
+            try:
+                function(*args)
+            except Exception as e:
+                print(f"Error in background request: {e}")
+
+
+class HttpTransport:
+    """A thread-safe, keep-alive HTTP client shared by the whole app.
+
+    ``on_request(method, url, status, seconds, size)`` is called after every
+    request; ``status`` is None when no response arrived.
+    """
+
+    def __init__(
+        self,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        retries=RETRIES,
+        on_request=None,
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.on_request = on_request
+        self.stats = {}  # Host -> HostStats
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        # requests is only imported once the first request is made
+        with self._lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+
+    def request(self, method, url, headers=None, data=None):
+        """Send a request and return the ``requests.Response``."""
+        response = None
+        started = time.perf_counter()
+        try:
+            response = self.session.request(
+                method,
+                url,
+                headers=headers,
+                data=data,
+                timeout=(self.connect_timeout, self.read_timeout),
+            )
+            return response
+        finally:
+            self._record(method, url, response, time.perf_counter() - started)
+
+    def get(self, url, headers=None):
+        return self.request("GET", url, headers=headers)
+
+    def authorized(self, credential_manager):
+        """An httplib2-style client for googleapiclient that sends the OAuth token."""
+        return AuthorizedHttp(self, credential_manager)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _create_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=self.retries,
+            status_forcelist=RETRY_STATUSES,
+            # Every call the widget makes only reads, batch POSTs included
+            allowed_methods=None,
+            backoff_factor=0.5,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _record(self, method, url, response, seconds):
+        host = urllib.parse.urlsplit(url).netloc
+        status = response.status_code if response is not None else None
+        size = len(response.content) if response is not None else 0
+        failed = status is None or status >= 500
+        with self._lock:
+            stats = self.stats.get(host, HostStats(0, 0, 0.0, 0.0, 0))
+            self.stats[host] = HostStats(
+                stats.requests + 1,
+                stats.errors + failed,
+                stats.seconds + seconds,
+                max(stats.slowest, seconds),
+                stats.bytes + size,
+            )
+        if self.on_request:
+            self.on_request(method, url, status, seconds, size)
+
+
+class AuthorizedHttp:
+    """Let googleapiclient send its requests through an HttpTransport.
+
+    googleapiclient expects an ``httplib2.Http``; this implements the one
+    method it calls. Tokens come from a CredentialManager, and refreshes
+    after a 401 go through it too, so they are serialised with the
+    background refresh.
+    """
+
+    def __init__(self, transport, credential_manager):
+        self.transport = transport
+        self.credential_manager = credential_manager
+        # Batch requests look for credentials on the http object
+        self.credentials = _ManagedCredentials(credential_manager)
+
+    def request(
+        self,
+        uri,
+        method="GET",
+        body=None,
+        headers=None,
+        redirections=None,
+        connection_type=None,
+    ):
+        import httplib2
+
+        headers = dict(headers or {})
+        self.credentials.apply(headers)
+        response = self.transport.request(method, uri, headers=headers, data=body)
+        if response.status_code == UNAUTHORIZED:
+            self.credential_manager.refresh(force=True)
+            self.credentials.apply(headers)
+            response = self.transport.request(method, uri, headers=headers, data=body)
+
+        info = httplib2.Response(dict(response.headers, status=response.status_code))
+        info.reason = response.reason
+        # requests has already decompressed the body
+        info.pop("content-encoding", None)
+        return info, response.content
+
+
+class _ManagedCredentials:
+    """The oauth2client-style credentials interface googleapiclient falls back on."""
+
+    def __init__(self, credential_manager):
+        self.credential_manager = credential_manager
+
+    @property
+    def access_token(self):
+        return self.credential_manager.credentials.token
+
+    @property
+    def access_token_expired(self):
+        return not self.credential_manager.credentials.valid
+
+    def refresh(self, http):
+        self.credential_manager.refresh(force=True)
+
+    def apply(self, headers):
+        self.credential_manager.credentials.apply(headers)
@@ -0,0 +1,154 @@
+"""In-process counters and histograms for diagnosing slowness.
+
+Any module can record into the shared registry without passing it around:
+
+    metrics.increment("auth.token_refreshes")
+    metrics.observe("http.latency_ms[www.googleapis.com]", 84.2)
+    with metrics.timer("render.events_ms"):
+        ...
+
+Histograms keep counts per 1-2-5 bucket rather than every sample, so
+recording is cheap and memory stays flat however long the widget runs.
+The widget dumps the registry to ``metrics.json`` in the config directory
+and shows it from the menu.
+"""
+
+import bisect
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+import urllib.parse
+
+# Upper bounds of the histogram buckets: 1, 2, 5, 10, 20, 50, ... 5e7
+BUCKETS = tuple(
+    mantissa * 10**exponent for exponent in range(8) for mantissa in (1, 2, 5)
+)
+
+
+class Histogram:
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.buckets = [0] * (len(BUCKETS) + 1)  # The last one has no upper bound
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+
+    def percentile(self, fraction):
+        """Estimate a percentile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "min": self.min,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "max": self.max,
+            "buckets": {
+                str(bound): count
+                for bound, count in zip(BUCKETS + ("inf",), self.buckets)
+                if count
+            },
+        }
+
+
+class Metrics:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.started_at = clock()
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Observe the milliseconds spent in the ``with`` block under ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - started) * 1000)
+
+    def record_request(self, method, url, status, seconds, size):
+        """HttpTransport ``on_request`` hook: latency and payload size per host."""
+        host = urllib.parse.urlsplit(url).netloc
+        self.increment(f"http.requests[{host}]")
+        if status is None or status >= 400:
+            self.increment(f"http.errors[{host}]")
+        self.observe(f"http.latency_ms[{host}]", seconds * 1000)
+        self.observe(f"http.response_bytes[{host}]", size)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "uptime_seconds": self.clock() - self.started_at,
+                "counters": dict(sorted(self.counters.items())),
+                "histograms": {
+                    name: histogram.to_dict()
+                    for name, histogram in sorted(self.histograms.items())
+                },
+            }
+
+    def dump(self, path):
+        """Write the metrics to ``path`` as JSON, replacing it atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as metrics_file:
+            json.dump(self.to_dict(), metrics_file, indent=2)
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        """The metrics as plain text, one line per counter or histogram."""
+        data = self.to_dict()
+        lines = [f"Uptime: {data['uptime_seconds'] / 60:.0f} min", ""]
+        for name, value in data["counters"].items():
+            lines.append(f"{name}: {value}")
+        if data["counters"]:
+            lines.append("")
+        for name, histogram in data["histograms"].items():
+            lines.append(
+                f"{name}: n={histogram['count']} p50={histogram['p50']:.1f} "
+                f"p95={histogram['p95']:.1f} max={histogram['max']:.1f}"
+            )
+        return "\n".join(lines)
+
+
+# The registry everything records into
+registry = Metrics()
+increment = registry.increment
+observe = registry.observe
+timer = registry.timer
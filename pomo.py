@@ -1,136 +1,55 @@
-import base64
 import datetime
-import hashlib
-import json
 import os
 import sys
 import threading
-import tkinter as tk
-from io import BytesIO
-from tkinter import messagebox, simpledialog, ttk
-
-import pytz
-import requests
-from cryptography.fernet import Fernet
-from dotenv import load_dotenv
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from PIL import Image, ImageDraw, ImageOps, ImageTk
-
-SCOPES = [
-    "https://www.googleapis.com/auth/calendar.events.readonly",
-    "https://www.googleapis.com/auth/userinfo.profile",
-]
-REDIRECT_URI = "https://localhost:8080/"
-
-# Define the color dictionary
-COLORS = {
-    "1": "#A4BDFC",  # Lavender
-    "2": "#7AE7BF",  # Sage
-    "3": "#DBADFF",  # Grape
-    "4": "#FF887C",  # Flamingo
-    "5": "#FBD75B",  # Banana
-    "6": "#FFB878",  # Tangerine
-    "7": "#46D6DB",  # Peacock
-    "8": "#E1E1E1",  # Graphite
-    "9": "#5484ED",  # Blueberry
-    "10": "#51B749",  # Basil
-    "11": "#DC2127",  # Tomato
-    None: "#000000",  # Default color (white)
-}
-
-
-def get_resource_path(relative_path):
-    """Get absolute path to resource, works for dev and for PyInstaller bundle."""
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
-
-
-class ToolTip(object):
-    def __init__(self, widget):
-        self.widget = widget
-        self.tipwindow = None
-        self.id = None
-        self.x = self.y = 0
-
-    def showtip(self, text):
-        "Display text in tooltip window"
-        self.text = text
-        if self.tipwindow or not self.text:
-            return
-        bbox = self.widget.bbox("insert")
-        if not bbox:  # If bbox is None, use the widget's position
-            x = self.widget.winfo_rootx() + self.widget.winfo_width() // 2
-            y = self.widget.winfo_rooty() + self.widget.winfo_height()
-        else:
-            x, y, _, _ = bbox
-            x += self.widget.winfo_rootx() + 25
-            y += self.widget.winfo_rooty() + 25
-
-        # creates a toplevel window
-        self.tipwindow = tw = tk.Toplevel(self.widget)
-        # Leaves only the label and removes the app window
-        tw.wm_overrideredirect(1)
-        tw.wm_geometry(f"+{x}+{y}")
-        label = tk.Label(
-            tw,
-            text=self.text,
-            justify=tk.LEFT,
-            background="#ffffe0",
-            relief=tk.SOLID,
-            borderwidth=1,
-            font=("tahoma", "8", "normal"),
-        )
-        label.pack(ipadx=1)
-
-    def hidetip(self):
-        tw = self.tipwindow
-        self.tipwindow = None
-        if tw:
-            tw.destroy()
-
-
-def create_tooltip(widget, text):
-    toolTip = ToolTip(widget)
-
-    def enter(event):
-        toolTip.showtip(text)
 
-    def leave(event):
-        toolTip.hidetip()
+if __name__ == "__main__" and "--headless" in sys.argv[1:]:
+    # Answer from the terminal without loading Tk, PIL or the widget
+    from headless import main
 
-    widget.bind("<Enter>", enter)
-    widget.bind("<Leave>", leave)
-
-
-def get_config_path():
-    """Get the path to the configuration directory."""
-    if sys.platform == "win32":
-        return os.path.join(os.environ["APPDATA"], "TimeTab")
-    elif sys.platform == "darwin":
-        return os.path.join(
-            os.path.expanduser("~"), "Library", "Application Support", "TimeTab"
-        )
-    else:  # linux or other unix-like
-        return os.path.join(os.path.expanduser("~"), ".config", "timetab")
+    sys.argv.remove("--headless")
+    sys.exit(main())
 
+if __name__ == "__main__":
+    from settings import get_config_path
+    from single_instance import SingleInstance, parse_command, send_command
 
-class Encryptor:
-    def __init__(self, key):
-        self.key = base64.urlsafe_b64encode(hashlib.sha256(key.encode()).digest())
-        self.f = Fernet(self.key)
+    try:
+        startup_command = parse_command(sys.argv[1:])
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    instance = SingleInstance(get_config_path())
+    if not instance.acquire():
+        # TimeTab is already running: hand the command over without loading Tk
+        reply = send_command(get_config_path(), sys.argv[1:])
+        if reply and reply != "ok":
+            print(reply)
+        sys.exit(0 if reply == "ok" else 1)
 
-    def encrypt(self, data):
-        return self.f.encrypt(json.dumps(data).encode()).decode()
+import tkinter as tk
+from tkinter import messagebox, simpledialog, ttk
 
-    def decrypt(self, data):
-        return json.loads(self.f.decrypt(data.encode()).decode())
+import metrics
+from agenda_view import AgendaWindow
+from avatar_cache import AvatarCache
+from calendar_events import COLORS, Event, EventIndex
+from calendar_sync import CalendarSync, PollPolicy, SnapshotCache, SyncWorker
+from credential_manager import CredentialManager
+from pomodoro import FOCUS, PomodoroCheckpoint, PomodoroTimer
+from scheduler import EventAlarms, Scheduler
+from settings import (
+    SCOPES,
+    create_transport,
+    get_config_path,
+    get_int_setting,
+    get_resource_path,
+    load_encryptor,
+)
+from ui_resources import Resources
+
+UPCOMING_EVENTS_SHOWN = 4  # Upcoming events listed below the current ones
+REQUEST_WORKERS = 4  # Threads for the requests made while connecting
 
 
 class LoginScreen(tk.Frame):
@@ -155,17 +74,37 @@ class CalendarWidgetMain(tk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
+        self.scheduler = parent.scheduler
         self.pack(fill=tk.BOTH, expand=True)
         self.configure(bg="#f0f4f8")
 
-        self.focus_time = 25  # Default focus time in minutes
+        self.pomodoro = PomodoroTimer(
+            focus_minutes=25,  # Default focus time
+            long_break_minutes=get_int_setting("TIMETAB_LONG_BREAK_MINUTES", 15),
+            cycles=get_int_setting("TIMETAB_CYCLES_PER_LONG_BREAK", 4),
+        )
+        # Survive restarts and sleep: resume from the saved deadline
+        self.pomodoro_checkpoint = PomodoroCheckpoint(
+            os.path.join(parent.config_dir, "pomodoro.json")
+        )
+        self.pomodoro.restore(self.pomodoro_checkpoint.load() or {})
+        self.pomodoro.on_change = self.pomodoro_checkpoint.save
+        self.snapshot = None  # Latest events handed over by the sync worker
+        self.event_index = EventIndex(())  # The snapshot's events, indexed by time
+        self.agenda = None  # The agenda window, while it is open
+        self.event_alarms = EventAlarms(
+            self.scheduler,
+            os.path.join(parent.config_dir, "notified.json"),
+            self.on_event_alarm,
+            reminder_minutes=get_int_setting("TIMETAB_REMINDER_MINUTES", 0),
+        )
         self.create_styles()
         self.create_header()
         self.create_events_area()
         self.create_pomodoro_area()
 
         self.update_widget()
-        self.update_pomodoro()
+        self.resume_pomodoro()
 
     def create_styles(self):
         style = ttk.Style()
@@ -274,7 +213,9 @@ class CalendarWidgetMain(tk.Frame):
         self.user_frame = ttk.Frame(self.header_frame, style="Header.TFrame")
         self.user_frame.pack(side=tk.LEFT)
 
-        self.user_image = self.load_user_image()
+        self.user_image_url = getattr(self.parent, "user_image_url", "")
+        self.user_image_path = None
+        self.load_user_image()
         self.user_image_label = ttk.Label(
             self.user_frame, image=self.user_image, background="#3498db"
         )
@@ -310,6 +251,19 @@ class CalendarWidgetMain(tk.Frame):
 
         self.create_menu()
 
+    def update_profile(self):
+        """Refresh the header once the live profile replaces the cached one."""
+        self.name_label.config(text=self.parent.user_name)
+        if self.parent.user_image_url != self.user_image_url:
+            self.user_image_url = self.parent.user_image_url
+            self.load_user_image()
+            self.user_image_label.config(image=self.user_image)
+
+    def avatar_size(self):
+        """Avatar edge in pixels, scaled up on HiDPI displays."""
+        scale = self.winfo_fpixels("1i") / 96
+        return round(40 * max(scale, 1))
+
     def create_menu(self):
         self.menu_var = tk.StringVar()
 
@@ -318,7 +272,10 @@ class CalendarWidgetMain(tk.Frame):
             self.time_menu_horizontal,
             self.menu_var,
             "",  # Use dots as menu icon
+            "Agenda",
             "About",
+            "Stats",
+            "Metrics",
             "Logout",
             command=self.handle_menu_selection,
         )
@@ -341,14 +298,41 @@ class CalendarWidgetMain(tk.Frame):
     def handle_menu_selection(self, selection):
         if selection == "Logout":
             self.parent.logout()
+        elif selection == "Agenda":
+            self.show_agenda()
         elif selection == "About":
             self.parent.show_about_dialog()
+        elif selection == "Stats":
+            self.parent.show_stats_dialog()
+        elif selection == "Metrics":
+            self.parent.show_metrics_dialog()
         self.menu_var.set("")  # Reset the menu to default text
 
     def create_events_area(self):
         self.events_canvas = tk.Canvas(self, bg="#ffffff", height=250, width=280)
         self.events_canvas.pack(padx=10, pady=10)
 
+        # Rows drawn on the canvas and their items, both keyed by row key
+        self.event_rows = {}
+        self.event_row_items = {}
+        self.event_item_keys = {}  # Canvas item id -> event key
+        self.shown_events = {}  # Event key -> event dict
+        self.events_view_hash = None
+
+        # Bind hovering once for every event instead of on each redraw
+        self.events_canvas.tag_bind("event", "<Enter>", self.on_event_enter)
+        self.events_canvas.tag_bind("event", "<Leave>", self.on_event_leave)
+        self.events_canvas.bind("<MouseWheel>", self.on_events_scroll)
+        self.events_canvas.bind("<Button-4>", self.on_events_scroll)
+        self.events_canvas.bind("<Button-5>", self.on_events_scroll)
+
+    def on_events_scroll(self, event):
+        # Windows and macOS send MouseWheel, X11 sends buttons 4 and 5
+        if event.num == 4 or event.delta > 0:
+            self.events_canvas.yview_scroll(-1, "units")
+        else:
+            self.events_canvas.yview_scroll(1, "units")
+
     def create_pomodoro_area(self):
         self.pomodoro_frame = ttk.Frame(self, style="Pomodoro.TFrame")
         self.pomodoro_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -371,7 +355,7 @@ class CalendarWidgetMain(tk.Frame):
 
         self.pomodoro_time = ttk.Label(
             timer_frame,
-            text=f"{self.focus_time}:00",
+            text=self.pomodoro.display(),
             style="PomodoroTime.TLabel",
         )
         self.pomodoro_time.pack(side=tk.LEFT)
@@ -384,32 +368,44 @@ class CalendarWidgetMain(tk.Frame):
         )
         self.set_time_button.pack(side=tk.LEFT, padx=(10, 0))
 
-        self.pomodoro_active = False
-        self.pomodoro_time_left = self.focus_time * 60
-
     def load_user_image(self):
-        if hasattr(self.parent, "user_image_url") and self.parent.user_image_url:
-            try:
-                response = requests.get(self.parent.user_image_url)
-                image = Image.open(BytesIO(response.content))
-                image = image.resize((40, 40), Image.LANCZOS)
-                image = self.create_circular_image(image)
-                return ImageTk.PhotoImage(image)
-            except Exception as e:
-                print(f"Error loading user image: {e}")
-
-        # Fallback to placeholder if no URL or loading fails
-        image = Image.new("RGB", (40, 40), color="#2980b9")
-        image = self.create_circular_image(image)
-        return ImageTk.PhotoImage(image)
-
-    def create_circular_image(self, image):
-        mask = Image.new("L", image.size, 0)
-        draw = ImageDraw.Draw(mask)
-        draw.ellipse((0, 0) + image.size, fill=255)
-        output = ImageOps.fit(image, mask.size, centering=(0.5, 0.5))
-        output.putalpha(mask)
-        return output
+        """Show the cached avatar, or a placeholder while it is fetched."""
+        avatar_cache = self.parent.avatar_cache
+        url = self.user_image_url
+        size = self.avatar_size()
+        path = avatar_cache.cached_path(url, size) if url else None
+        if url:
+            # Revalidate in the background even when a cached copy is shown
+            self.parent.request_pool.submit(self.fetch_user_image, url, size)
+        self.set_user_image(path or avatar_cache.placeholder(size))
+
+    def set_user_image(self, path):
+        """Take the avatar at ``path`` from the image cache."""
+        resources = self.parent.resources
+        if self.user_image_path not in (None, path):
+            # Avatar files are named after their content, so a changed
+            # avatar has a new path and the image it replaces is stale
+            resources.forget(self.user_image_path)
+        self.user_image_path = path
+        self.user_image = resources.image(path)
+
+    def fetch_user_image(self, url, size):
+        """Download and render the avatar off the Tk main thread."""
+        try:
+            path = self.parent.avatar_cache.render(url, size)
+        except Exception as e:
+            print(f"Error loading user image: {e}")
+            return
+        try:
+            self.after_idle(lambda: self.show_user_image(url, path))
+        except RuntimeError:
+            pass  # The main loop has already exited
+
+    def show_user_image(self, url, path):
+        # Skip images for a profile that has been replaced in the meantime
+        if url == self.user_image_url and path != self.user_image_path:
+            self.set_user_image(path)
+            self.user_image_label.config(image=self.user_image)
 
     def update_widget(self):
         current_time = datetime.datetime.now()
@@ -421,7 +417,9 @@ class CalendarWidgetMain(tk.Frame):
 
         self.update_events()
 
-        self.after(1000 * 60, self.update_widget)  # Update every minutes
+        # Wake up again when the clock rolls over to the next minute
+        seconds = current_time.second + current_time.microsecond / 1e6
+        self.scheduler.schedule("clock", 60 - seconds, self.update_widget)
 
     def get_greeting(self, current_time):
         hour = current_time.hour
@@ -432,140 +430,241 @@ class CalendarWidgetMain(tk.Frame):
         else:
             return "Good evening"
 
+    def show_snapshot(self, snapshot):
+        """Redraw from a snapshot that the sync worker just completed."""
+        self.snapshot = snapshot
+        self.event_index = EventIndex(snapshot.events)
+        self.event_alarms.update(snapshot.events)
+        self.update_events()
+
+    def on_event_alarm(self, kind, events):
+        if kind == "reminder":
+            minutes = self.event_alarms.reminder_minutes
+            self.show_event_start_notifications(events, f"Starts in {minutes} minutes")
+        else:
+            self.show_event_start_notifications(events)
+
+    def on_event_boundary(self):
+        # An event started or ended, so it moves between the two lists
+        self.update_events()
+
+    def schedule_event_boundary(self):
+        """Redraw exactly when the next shown event starts or ends."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        boundary = self.event_index.next_boundary(now)
+        if boundary is not None:
+            delay = (boundary - now).total_seconds()
+            self.scheduler.schedule("boundary", delay, self.on_event_boundary)
+        else:
+            self.scheduler.cancel("boundary")
+
+    def show_agenda(self):
+        if self.agenda is not None and self.agenda.winfo_exists():
+            self.agenda.lift()
+            return
+        self.agenda = AgendaWindow(
+            self, self.event_color, self.parent.resources.tooltip
+        )
+        self.agenda.show_index(self.event_index)
+
+    def event_color(self, event):
+        """The event's own colour, else its calendar's; shared by list and agenda."""
+        calendar = (self.snapshot.calendars if self.snapshot else {}).get(
+            event.calendar_id
+        )
+        return event.color or self.calendar_color(calendar)
+
     def update_events(self):
-        self.events_canvas.delete("all")
+        self.schedule_event_boundary()
+        if self.agenda is not None and self.agenda.winfo_exists():
+            # Only lays the agenda out again after a sync or at midnight
+            self.agenda.show_index(self.event_index)
+        with metrics.timer("render.build_rows_ms"):
+            rows, events = self.build_event_rows()
+        # Nothing changed since the last redraw, so leave the canvas alone
+        view_hash = hash(rows)
+        if view_hash == self.events_view_hash:
+            metrics.increment("render.skipped")
+            return
+        self.events_view_hash = view_hash
+        self.shown_events = events
+        with metrics.timer("render.events_ms"):
+            self.render_event_rows(rows)
+
+    def build_event_rows(self):
+        """Describe the events area as hashable rows.
+
+        Every row is a tuple starting with ``(kind, key, y_offset)``. Events
+        are keyed by calendar and event id and carry their ``updated`` stamp,
+        so an event is only redrawn when Google reports a change to it.
+        """
+        if self.snapshot is None:
+            return (("label", "loading", 15, "Loading events..."),), {}
+
         current_events, upcoming_events = self.get_upcoming_events()
+        rows = []
+        events = {}
         y_offset = 10
         colors = ["#4285F4", "#D81B60", "#F4511E", "#F6BF26", "#0B8043"]
 
         # Display Current Events
         if current_events:
-            self.events_canvas.create_text(
-                10,
-                y_offset + 5,
-                text="Current Events:",
-                anchor="w",
-                font=("Arial", 12, "bold"),
-            )
+            rows.append(("label", "current", y_offset + 5, "Current Events:"))
             y_offset += 20
             for event in current_events:
-                self.create_event_rectangle(event, y_offset, "#0B8043")
+                rows.append(("event", event.key, y_offset, "#0B8043", event.updated))
+                events[event.key] = event
                 y_offset += 50
         else:
-            self.events_canvas.create_text(
-                10,
-                y_offset + 5,
-                text="No Current Events",
-                anchor="w",
-                font=("Arial", 12, "bold"),
-            )
+            rows.append(("label", "current", y_offset + 5, "No Current Events"))
             y_offset += 20
-            self.events_canvas.create_rectangle(
-                10, y_offset, 270, y_offset + 40, fill="#4ac1d9", outline=""
-            )
-            self.events_canvas.create_text(
-                25,
-                y_offset + 18,
-                text="Free time!",
-                anchor="w",
-                fill="white",
-                font=("Arial", 13, "bold"),
-            )
+            rows.append(("free", "free", y_offset))
             y_offset += 55
 
         # Display Upcoming Events
         if upcoming_events:
-            self.events_canvas.create_text(
-                10,
-                y_offset + 3,
-                text="Upcoming Events:",
-                anchor="w",
-                font=("Arial", 12, "bold"),
-            )
+            rows.append(("label", "upcoming", y_offset + 3, "Upcoming Events:"))
             y_offset += 20
 
-            for i, event in enumerate(upcoming_events[:4]):
-                color = colors[i % len(colors)]
-                self.create_event_rectangle(event, y_offset, color)
+            # Tell calendars apart by colour once more than one is shown
+            calendars = self.snapshot.calendars
+            for i, event in enumerate(upcoming_events):
+                if len(calendars) > 1:
+                    color = self.event_color(event)
+                else:
+                    color = colors[i % len(colors)]
+                rows.append(("event", event.key, y_offset, color, event.updated))
+                events[event.key] = event
                 y_offset += 50
         else:
-            self.events_canvas.create_text(
-                10,
-                y_offset,
-                text="No Upcoming Events",
+            rows.append(("label", "upcoming", y_offset, "No Upcoming Events"))
+
+        return tuple(rows), events
+
+    def calendar_color(self, calendar):
+        # A calendar's colorId indexes Google's calendar palette, not COLORS
+        return (calendar or {}).get("backgroundColor") or COLORS[None]
+
+    def render_event_rows(self, rows):
+        """Bring the canvas in line with ``rows``, touching only what changed."""
+        canvas = self.events_canvas
+        row_items = {}
+        for row in rows:
+            kind, key, y_offset = row[:3]
+            old_row = self.event_rows.get(key)
+            items = self.event_row_items.get(key)
+            if (
+                old_row is None
+                or old_row[0] != kind
+                or kind == "event"
+                and (old_row[4] != row[4])
+            ):
+                # New row, or an event that was edited since it was drawn
+                if items:
+                    self.delete_row_items(items)
+                items = self.create_row_items(row)
+            else:
+                if kind == "label" and old_row[3] != row[3]:
+                    canvas.itemconfig(items[0], text=row[3])
+                elif kind == "event" and old_row[3] != row[3]:
+                    canvas.itemconfig(items[0], fill=row[3])
+                if old_row[2] != y_offset:
+                    for item in items:
+                        canvas.move(item, 0, y_offset - old_row[2])
+            row_items[key] = items
+
+        for key, items in self.event_row_items.items():
+            if key not in row_items:
+                self.delete_row_items(items)
+        self.event_rows = {row[1]: row for row in rows}
+        self.event_row_items = row_items
+        # Many current events no longer fit, so let the list scroll
+        bbox = canvas.bbox("all") or (0, 0, 0, 0)
+        canvas.configure(scrollregion=(0, 0, 280, bbox[3] + 10))
+
+    def create_row_items(self, row):
+        kind, key, y_offset = row[:3]
+        if kind == "label":
+            return (
+                self.events_canvas.create_text(
+                    10,
+                    y_offset,
+                    text=row[3],
+                    anchor="w",
+                    font=("Arial", 12, "bold"),
+                ),
+            )
+        if kind == "free":
+            rect_id = self.events_canvas.create_rectangle(
+                10, y_offset, 270, y_offset + 40, fill="#4ac1d9", outline=""
+            )
+            text_id = self.events_canvas.create_text(
+                25,
+                y_offset + 18,
+                text="Free time!",
                 anchor="w",
-                font=("Arial", 12, "bold"),
+                fill="white",
+                font=("Arial", 13, "bold"),
             )
+            return rect_id, text_id
+        return self.create_event_rectangle(self.shown_events[key], y_offset, row[3])
 
-    def create_event_rectangle(self, event, y_offset, color):
-        start = event["start"].get("dateTime", event["start"].get("date"))
-        end = event["end"].get("dateTime", event["end"].get("date"))
-        start_dt = datetime.datetime.fromisoformat(start.replace("Z", "+00:00"))
-        end_dt = datetime.datetime.fromisoformat(end.replace("Z", "+00:00"))
+    def delete_row_items(self, items):
+        for item in items:
+            self.events_canvas.delete(item)
+            self.event_item_keys.pop(item, None)
 
+    def create_event_rectangle(self, event, y_offset, color):
         rect_id = self.events_canvas.create_rectangle(
-            10, y_offset, 270, y_offset + 40, fill=color, outline=""
+            10, y_offset, 270, y_offset + 40, fill=color, outline="", tags="event"
         )
         text_id1 = self.events_canvas.create_text(
             25,
             y_offset + 10,
-            text=f"{start_dt.strftime('%Y-%m-%d %H:%M')} - {end_dt.strftime('%Y-%m-%d %H:%M')}",
+            text=event.time_text,
             anchor="w",
             fill="white",
             font=("Arial", 9),
+            tags="event",
         )
         text_id2 = self.events_canvas.create_text(
             25,
             y_offset + 25,
-            text=event["summary"],
+            text=event.summary,
             anchor="w",
             fill="white",
             font=("Arial", 12, "bold"),
+            tags="event",
         )
+        for item in (rect_id, text_id1, text_id2):
+            self.event_item_keys[item] = event.key
+        return rect_id, text_id1, text_id2
 
-        # Create tooltip for the event
-        description = event.get("description", "No description available")
-        tooltip_text = f"Summary: {event['summary']}\nDescription: {description}"
-
-        def show_tooltip(event):
-            if not hasattr(self, "tip") or not self.tip.winfo_exists():
-                x = self.events_canvas.winfo_rootx() + event.x + 10
-                y = self.events_canvas.winfo_rooty() + event.y + 10
-                self.tip = tk.Toplevel(self.events_canvas)
-                self.tip.wm_overrideredirect(True)
-                self.tip.wm_geometry(f"+{x}+{y}")
-                label = tk.Label(
-                    self.tip,
-                    text=tooltip_text,
-                    justify=tk.LEFT,
-                    background="#ffffe0",
-                    relief=tk.SOLID,
-                    borderwidth=1,
-                    font=("tahoma", "8", "normal"),
-                )
-                label.pack(ipadx=1)
-
-        def hide_tooltip(event):
-            if hasattr(self, "tip") and self.tip.winfo_exists():
-                self.tip.destroy()
-
-        def on_enter(event):
-            # Change color only, skip zooming
-            lighter_color = self.lighten_color(color)
-            self.events_canvas.itemconfig(rect_id, fill=lighter_color)
-            show_tooltip(event)
+    def hovered_event_key(self):
+        items = self.events_canvas.find_withtag("current")
+        return self.event_item_keys.get(items[0]) if items else None
 
-        def on_leave(event):
+    def on_event_enter(self, tk_event):
+        key = self.hovered_event_key()
+        if key not in self.shown_events:
+            return
+        rect_id = self.event_row_items[key][0]
+        color = self.event_rows[key][3]
+        # Change color only, skip zooming
+        self.events_canvas.itemconfig(rect_id, fill=self.lighten_color(color))
+
+        # Show the event in the shared tooltip window
+        x = self.events_canvas.winfo_rootx() + tk_event.x + 10
+        y = self.events_canvas.winfo_rooty() + tk_event.y + 10
+        self.parent.resources.tooltip.show(self.shown_events[key].tooltip_text, x, y)
+
+    def on_event_leave(self, tk_event):
+        key = self.hovered_event_key()
+        if key in self.shown_events:
             # Restore original color
-            self.events_canvas.itemconfig(rect_id, fill=color)
-            hide_tooltip(event)
-
-        self.events_canvas.tag_bind(rect_id, "<Enter>", on_enter)
-        self.events_canvas.tag_bind(rect_id, "<Leave>", on_leave)
-        self.events_canvas.tag_bind(text_id1, "<Enter>", on_enter)
-        self.events_canvas.tag_bind(text_id1, "<Leave>", on_leave)
-        self.events_canvas.tag_bind(text_id2, "<Enter>", on_enter)
-        self.events_canvas.tag_bind(text_id2, "<Leave>", on_leave)
+            rect_id = self.event_row_items[key][0]
+            self.events_canvas.itemconfig(rect_id, fill=self.event_rows[key][3])
+        self.parent.resources.tooltip.hide()
 
     def lighten_color(self, color):
         # Convert color to RGB
@@ -579,123 +678,14 @@ class CalendarWidgetMain(tk.Frame):
 
     def get_upcoming_events(self):
         now = datetime.datetime.now(datetime.timezone.utc)
-        now_iso = now.isoformat()
-        service = self.parent.service  # Reuse the cached service
-        events_result = (
-            service.events()
-            .list(
-                calendarId="primary",
-                timeMin=now_iso,
-                maxResults=10,
-                singleEvents=True,
-                orderBy="startTime",
-            )
-            .execute()
-        )
-
-        current_events = []
-        upcoming_events = []
-        newly_started_events = []
-
-        for event in events_result.get("items", []):
-            start = event["start"].get("dateTime", event["start"].get("date"))
-            end = event["end"].get("dateTime", event["end"].get("date"))
-
-            # Parse the datetime strings and set the timezone
-            start_dt = datetime.datetime.fromisoformat(
-                start.replace("Z", "+00:00")
-            ).astimezone(pytz.UTC)
-            end_dt = datetime.datetime.fromisoformat(
-                end.replace("Z", "+00:00")
-            ).astimezone(pytz.UTC)
-
-            # Check if event is currently happening
-            if start_dt <= now <= end_dt:
-                current_events.append(event)
-
-                # Check if the event just started (within the last minute)
-                if now - start_dt <= datetime.timedelta(minutes=1):
-                    newly_started_events.append(event)
-
-            # Check for upcoming events
-            elif start_dt > now:
-                upcoming_events.append(event)
-
-            # print(f"Now: {now}")
-            # print(f"Start: {start_dt}")
-            # print(f"End: {end_dt}")
-            # print(f"Event: {event['summary']}")
-            # print(f"Is current: {start_dt <= now <= end_dt}")
-            # print("---")
-
-            # 'start': {'dateTime': '2024-10-13T22:30:00+06:00', 'timeZone': 'Asia/Dhaka'}, 'end': {'dateTime': '2024-10-14T04:30:00+06:00', 'timeZone': 'Asia/Dhaka'},
-
-            if len(current_events) + len(upcoming_events) >= 4:
-                break
-
-        # Trigger notifications for newly started events
-        if newly_started_events:
-            self.show_event_start_notifications(newly_started_events)
-
-        return current_events, upcoming_events
-
-    def show_event_start_notifications(self, events):
-        """Display notifications for events that just started"""
-        for event in events:
-            notification_window = tk.Toplevel(self)
-            notification_window.title("Event Starting")
-            notification_window.geometry("300x150")
-            notification_window.attributes("-topmost", True)
-            notification_window.configure(bg="#f0f0f0")
-
-            # Set custom icon
-            icon_path = get_resource_path("timetab_win.ico")
-            notification_window.iconbitmap(icon_path)
-
-            # Event title
-            title_label = tk.Label(
-                notification_window,
-                text="Event Started",
-                font=("Helvetica", 14, "bold"),
-                bg="#f0f0f0",
-            )
-            title_label.pack(pady=(10, 5))
-
-            # Event summary
-            summary_label = tk.Label(
-                notification_window,
-                text=event.get("summary", "Untitled Event"),
-                font=("Helvetica", 12),
-                bg="#f0f0f0",
-            )
-            summary_label.pack(pady=5)
-
-            # Start and end time
-            start = event["start"].get("dateTime", event["start"].get("date"))
-            end = event["end"].get("dateTime", event["end"].get("date"))
-            start_dt = datetime.datetime.fromisoformat(start.replace("Z", "+00:00"))
-            end_dt = datetime.datetime.fromisoformat(end.replace("Z", "+00:00"))
-
-            time_label = tk.Label(
-                notification_window,
-                text=f"{start_dt.strftime('%Y-%m-%d %H:%M')} - {end_dt.strftime('%Y-%m-%d %H:%M')}",
-                font=("Helvetica", 10),
-                bg="#f0f0f0",
-            )
-            time_label.pack(pady=5)
-
-            # Close button
-            close_button = tk.Button(
-                notification_window,
-                text="Close",
-                command=notification_window.destroy,
-                bg="#4CAF50",
-                fg="white",
-            )
-            close_button.pack(pady=10)
+        # Never fetch here: the sync worker keeps self.snapshot up to date.
+        # Every current event is shown, followed by the next few to start
+        return self.event_index.split(now, limit=UPCOMING_EVENTS_SHOWN)
 
-            # Auto-close after 10 seconds
-            notification_window.after(10000, notification_window.destroy)
+    def show_event_start_notifications(self, events, title="Event Started"):
+        """Display one notification for the events that just started together"""
+        if events:
+            self.parent.resources.notify(title, events)
 
     def set_focus_time(self):
         new_time = simpledialog.askinteger(
@@ -706,75 +696,86 @@ class CalendarWidgetMain(tk.Frame):
             parent=self.parent,
         )
         if new_time:
-            self.focus_time = new_time
-            self.pomodoro_time_left = new_time * 60
-            self.pomodoro_time.config(text=f"{new_time}:00")
+            if self.pomodoro.focusing:
+                # The running session restarts with the new length
+                self.log_focus_session(completed=False)
+            self.pomodoro.set_focus_minutes(new_time)
+            self.pomodoro_time.config(text=self.pomodoro.display())
 
     def start_pomodoro(self):
-        if not self.pomodoro_active:
-            self.pomodoro_active = True
-            self.pomodoro_time_left = self.focus_time * 60
-            self.start_pomodoro_button.config(
-                text="Stop Focus", style="Stop.Pomodoro.TButton"
-            )
+        if not self.pomodoro.active:
+            self.pomodoro.start()
+            self.update_pomodoro()
         else:
-            self.pomodoro_active = False
-            self.pomodoro_time_left = self.focus_time * 60
-            self.pomodoro_time.config(text=f"{self.focus_time}:00")
-            self.start_pomodoro_button.config(
-                text="Start Focus", style="Start.Pomodoro.TButton"
-            )
+            # Stops a focus session, or skips the break
+            if self.pomodoro.focusing:
+                self.log_focus_session(completed=False)
+            self.pomodoro.stop()
+            self.scheduler.cancel("pomodoro")
+            self.pomodoro_time.config(text=self.pomodoro.display())
+            self.update_pomodoro_button()
+
+    def start_focus(self, minutes=None):
+        """Start a focus session, of ``minutes`` if given, unless one is running."""
+        if minutes and minutes != self.pomodoro.focus_minutes:
+            if self.pomodoro.focusing:
+                self.log_focus_session(completed=False)
+            self.pomodoro.set_focus_minutes(minutes)
+        if not self.pomodoro.focusing:
+            # Starting a focus session ends the break
+            self.pomodoro.start()
+        self.update_pomodoro()
+
+    def resume_pomodoro(self):
+        """Pick up a session that was running when the app last closed."""
+        for phase in self.pomodoro.catch_up():
+            if phase == FOCUS:
+                self.log_focus_session(completed=True)
+        if self.pomodoro.active:
+            self.update_pomodoro()
 
     def update_pomodoro(self):
-        if self.pomodoro_active:
-            if self.pomodoro_time_left > 0:
-                minutes, seconds = divmod(self.pomodoro_time_left, 60)
-                self.pomodoro_time.config(text=f"{minutes:02d}:{seconds:02d}")
-                self.pomodoro_time_left -= 1
+        for phase in self.pomodoro.catch_up():
+            if phase == FOCUS:
+                self.log_focus_session(completed=True)
+                if self.pomodoro.active:
+                    self.show_break_popup()
             else:
-                self.pomodoro_active = False
-                self.start_pomodoro_button.config(text="Start Focus")
-                self.show_break_popup()
-                self.pomodoro_time_left = self.focus_time * 60
-                self.pomodoro_time.config(text=f"{self.focus_time}:00")
-
-        self.after(1000, self.update_pomodoro)
-
-    def update_pomodoro_timer(self):
-        if self.pomodoro_time_left > 0:
-            minutes, seconds = divmod(self.pomodoro_time_left, 60)
-            self.pomodoro_time.config(text=f"{minutes:02d}:{seconds:02d}")
-            self.pomodoro_time_left -= 1
+                self.bell()  # The break is over
+        self.update_pomodoro_button()
+        self.pomodoro_time.config(text=self.pomodoro.display())
+
+        # Recomputed from the deadline, so a late tick never slows the timer
+        if self.pomodoro.active:
+            self.scheduler.schedule(
+                "pomodoro", self.pomodoro.next_tick_delay(), self.update_pomodoro
+            )
+
+    def update_pomodoro_button(self):
+        if self.pomodoro.focusing:
+            text, style = "Stop Focus", "Stop.Pomodoro.TButton"
+        elif self.pomodoro.active:
+            text, style = "Skip Break", "Stop.Pomodoro.TButton"
         else:
-            self.pomodoro_active = False
-            self.start_pomodoro_button.config(text="Start Focus")
-            self.show_break_popup()
-            self.pomodoro_time_left = self.focus_time * 60
-            self.pomodoro_time.config(text=f"{self.focus_time}:00")
+            text, style = "Start Focus", "Start.Pomodoro.TButton"
+        self.start_pomodoro_button.config(text=text, style=style)
 
-    def show_break_popup(self):
-        popup = tk.Toplevel(self)
-        popup.title("Break Time")
-
-        # Maximize the window
-        popup.state("zoomed")
-        # popup.geometry("300x150")
-        popup.attributes("-topmost", True)
-        popup.focus_force()
-        # Set custom icon
-        icon_path = get_resource_path("timetab_win.ico")
-        popup.iconbitmap(icon_path)
-
-        message = ttk.Label(
-            popup,
-            text=f"Time's up! Take a {max(self.focus_time // 5, 5)} minute break.",
-            font=("Helvetica", 12),
-            background="#ffffff",
-        )
-        message.pack(pady=20)
+    def log_focus_session(self, completed):
+        session_log = self.parent.session_log
+        started_at = self.pomodoro.started_at
+        if session_log is None or started_at is None:
+            return
+        planned = self.pomodoro.focus_minutes * 60
+        # A completed session ended at its deadline, even if that was in our sleep
+        ended_at = started_at + planned if completed else None
+        try:
+            session_log.record(started_at, planned, completed, ended_at=ended_at)
+        except Exception as e:
+            print(f"Error logging focus session: {e}")
 
-        ok_button = ttk.Button(popup, text="OK", command=popup.destroy)
-        ok_button.pack(pady=10)
+    def show_break_popup(self):
+        minutes = self.pomodoro.phase_minutes(self.pomodoro.phase)
+        self.parent.resources.show_break(f"Time's up! Take a {minutes} minute break.")
 
 
 class CalendarWidget(tk.Tk):
@@ -785,30 +786,58 @@ class CalendarWidget(tk.Tk):
         self.configure(bg="#ffffff")
 
         self.service = None
+        self.sync_worker = None
+        self.calendar_widget = None
+        self.pending_command = None  # Waits for the calendar widget to appear
         self.flow = None
         self.user_name = "User"
+        self.user_image_url = ""
+        self.scheduler = Scheduler(self)
+        self.request_pool = None  # Created with the session
+        self.connect_attempt = None  # Results of older attempts are ignored
 
-        # Set custom icon
-        icon_path = get_resource_path("timetab_win.ico")
-        self.iconbitmap(default=icon_path)
+        # Icons, images and pooled popup windows, each loaded or built once
+        self.resources = Resources(self, self.scheduler)
+        self.resources.apply_icon()
 
         # Ensure config directory exists
         self.config_dir = get_config_path()
         os.makedirs(self.config_dir, exist_ok=True)
 
         self.token_path = os.path.join(self.config_dir, "token.enc")
-        credentials_path = get_resource_path("credentials.json")
+        self.metrics_path = os.path.join(self.config_dir, "metrics.json")
+        self.session_log = None  # Opened once the window is drawn
+
+        # Let Tk draw the window before the crypto and Google modules load
+        self.after_idle(self.start_session)
 
-        # Load environment variables
-        load_dotenv()
-        encryption_key = os.getenv("ENCRYPTION_KEY")
-        if not encryption_key:
-            encryption_key = base64.b64encode(os.urandom(32)).decode()
-            # print("No encryption key set, generated a random one:")
-            # print(encryption_key)
+    def start_session(self):
+        from http_transport import RequestPool
+        from session_log import SessionLog
 
-        # Initialize encryptor with a secret key (you should use a more secure key in production)
-        self.encryptor = Encryptor(encryption_key)
+        credentials_path = get_resource_path("credentials.json")
+        try:
+            self.session_log = SessionLog(os.path.join(self.config_dir, "sessions.db"))
+        except Exception as e:
+            print(f"Error opening the focus session log: {e}")
+        self.encryptor = load_encryptor()
+        self.cache = SnapshotCache(
+            os.path.join(self.config_dir, "cache.enc"), self.encryptor
+        )
+        # One keep-alive connection pool for Google and the avatar server, and
+        # a bounded set of threads so independent requests overlap
+        self.transport = create_transport()
+        self.request_pool = RequestPool(REQUEST_WORKERS)
+        self.avatar_cache = AvatarCache(
+            os.path.join(self.config_dir, "avatars"), self.transport
+        )
+        self.credentials = CredentialManager(
+            self.token_path,
+            self.encryptor,
+            SCOPES,
+            transport=self.transport,
+            on_revoked=self.on_token_revoked,
+        )
 
         if not os.path.exists(credentials_path):
             self.show_error_message(
@@ -817,6 +846,36 @@ class CalendarWidget(tk.Tk):
         else:
             self.authenticate()
 
+    def serve_commands(self, instance, command):
+        """Take commands from later launches, starting with this launch's own."""
+        try:
+            instance.serve(self.on_command)
+        except OSError as e:
+            print(f"Error listening for commands: {e}")
+        if command != ("show", []):
+            self.after_idle(lambda: self.run_command(*command))
+
+    def on_command(self, name, args):
+        """Called on the command listener thread; hop back onto the Tk main loop."""
+        try:
+            self.after_idle(lambda: self.run_command(name, args))
+        except RuntimeError:
+            pass  # The main loop has already exited
+
+    def run_command(self, name, args):
+        if name == "refresh":
+            self.request_sync()
+            return
+        if name == "focus":
+            if self.calendar_widget is None:
+                # Still signing in; start once the widget is shown
+                self.pending_command = (name, args)
+            else:
+                self.calendar_widget.start_focus(*args)
+        self.deiconify()
+        self.lift()
+        self.focus_force()
+
     def show_error_message(self, message):
         messagebox.showerror("Error", message)
         self.quit()
@@ -974,20 +1033,87 @@ class CalendarWidget(tk.Tk):
         # Keep focus on the about window
         about_window.focus_set()
 
+    def show_metrics_dialog(self):
+        """Show the latency and timing metrics, and write them to metrics.json."""
+        metrics_window = tk.Toplevel(self)
+        metrics_window.title("TimeTab Metrics")
+        metrics_window.geometry("460x360")
+        metrics_window.transient(self)
+
+        text = tk.Text(metrics_window, wrap="none", font=("Courier", 9))
+        text.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+
+        path_label = ttk.Label(metrics_window, text=f"Saved to {self.metrics_path}")
+        path_label.pack(padx=10, anchor="w")
+
+        def refresh():
+            self.dump_metrics()
+            text.config(state="normal")
+            text.delete("1.0", "end")
+            text.insert("1.0", metrics.registry.summary())
+            text.config(state="disabled")
+
+        buttons_frame = ttk.Frame(metrics_window)
+        buttons_frame.pack(pady=5)
+        ttk.Button(buttons_frame, text="Refresh", command=refresh).pack(
+            side=tk.LEFT, padx=5
+        )
+        ttk.Button(buttons_frame, text="Close", command=metrics_window.destroy).pack(
+            side=tk.LEFT, padx=5
+        )
+        refresh()
+
+    def show_stats_dialog(self):
+        """Show focus time for today, this week and each of the last seven days."""
+        stats_window = tk.Toplevel(self)
+        stats_window.title("TimeTab Focus Stats")
+        stats_window.geometry("420x260")
+        stats_window.transient(self)
+
+        text = tk.Text(stats_window, wrap="none", font=("Courier", 9))
+        text.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        if self.session_log is None:
+            text.insert("1.0", "No focus sessions logged yet")
+        else:
+            text.insert("1.0", self.session_log.summary())
+        text.config(state="disabled")
+
+        ttk.Button(stats_window, text="Close", command=stats_window.destroy).pack(
+            pady=5
+        )
+
+    def dump_metrics(self):
+        """Write metrics.json; called on exit and from the Metrics dialog."""
+        try:
+            metrics.registry.dump(self.metrics_path)
+        except OSError as e:
+            print(f"Error saving metrics: {e}")
+
     def logout(self):
         if messagebox.askyesno("Logout", "Are you sure you want to logout?"):
-            # Clear the stored credentials
-            if os.path.exists(self.token_path):
-                os.remove(self.token_path)
+            # Clear the stored credentials and the cached calendar
+            self.credentials.clear()
+            self.cache.clear()
+            self.avatar_cache.clear()
+            if self.calendar_widget is not None:
+                self.calendar_widget.event_alarms.clear()
 
             # Clear the current session
-            self.service = None
+            self.scheduler.cancel_all()
+            self.stop_sync()
             self.user_name = "User"
             self.user_image_url = ""
 
-            # Remove the calendar widget
-            if hasattr(self, "calendar_widget"):
+            # The scheduler no longer hides open notifications, so do it now
+            self.resources.hide_all()
+
+            # Remove the calendar widget and its agenda
+            if self.calendar_widget is not None:
+                agenda = self.calendar_widget.agenda
+                if agenda is not None and agenda.winfo_exists():
+                    agenda.destroy()
                 self.calendar_widget.pack_forget()
+                self.calendar_widget = None
 
             # Show the login screen again
             self.show_login_screen()
@@ -997,6 +1123,9 @@ class CalendarWidget(tk.Tk):
             self.login_screen.pack_forget()
         self.calendar_widget = CalendarWidgetMain(self)
         self.calendar_widget.pack()
+        if self.pending_command:
+            command, self.pending_command = self.pending_command, None
+            self.run_command(*command)
 
         # self.calendar_widget = CalendarWidgetMain(self)
         # self.calendar_widget.pack()
@@ -1005,48 +1134,144 @@ class CalendarWidget(tk.Tk):
         # self.calendar_widget.pack(fill=tk.BOTH, expand=True)
 
     def authenticate(self):
-        creds = None
         credential_path = get_resource_path("credentials.json")
-        if os.path.exists(self.token_path):
-            try:
-                with open(self.token_path, "r") as token_file:
-                    encrypted_token = token_file.read()
-                    token_data = self.encryptor.decrypt(encrypted_token)
-                    creds = Credentials.from_authorized_user_info(token_data, SCOPES)
-            except Exception as e:
-                print(f"Error loading credentials: {e}")
-                creds = None
-                if os.path.exists(self.token_path):
-                    os.remove(self.token_path)
-
-        if not creds or not creds.valid:
-            if creds and creds.expired:  # and creds.refresh_token:
-                try:
-                    creds.refresh(Request())
-                except Exception as e:
-                    print(f"Error refreshing credentials: {e}")
-                    creds = None
-                    if os.path.exists(self.token_path):
-                        os.remove(self.token_path)
-
-            if not creds:
-                if hasattr(self, "auth_thread") and self.auth_thread.is_alive():
-                    return  # Don't start another auth flow if one is already running
-
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    credential_path, SCOPES
-                )
-                self.auth_thread = threading.Thread(
-                    target=self.run_auth_flow, args=(flow,)
-                )
-                self.auth_thread.daemon = (
-                    True  # Make thread daemon so it closes with main app
-                )
-                self.auth_thread.start()
-                return  # Return here as we'll handle the rest in run_auth_flow
+        if not self.credentials.exists():
+            if hasattr(self, "auth_thread") and self.auth_thread.is_alive():
+                return  # Don't start another auth flow if one is already running
+
+            # Only needed for the first sign-in, so it is imported on demand
+            from google_auth_oauthlib.flow import InstalledAppFlow
 
-        # If we have valid credentials, proceed with setup
-        self.setup_services(creds)
+            flow = InstalledAppFlow.from_client_secrets_file(credential_path, SCOPES)
+            self.auth_thread = threading.Thread(target=self.run_auth_flow, args=(flow,))
+            self.auth_thread.daemon = (
+                True  # Make thread daemon so it closes with main app
+            )
+            self.auth_thread.start()
+            return  # Return here as we'll handle the rest in run_auth_flow
+
+        # Paint the last known state right away; the token is read and
+        # refreshed in the background
+        self.show_cached_widget()
+        self.start_connect()
+
+    def show_cached_widget(self):
+        """Show the cached profile and events before Google has answered."""
+        profile = self.cache.load().get("profile")
+        if not profile or self.calendar_widget is not None:
+            return
+        self.user_name = profile.get("name", "User")
+        self.user_image_url = profile.get("picture", "")
+        self.show_calendar_widget()
+        snapshot = self.cache.snapshot()
+        if snapshot is not None:
+            self.calendar_widget.show_snapshot(snapshot)
+
+    def start_connect(self):
+        self.connect_attempt = attempt = object()
+        self.request_pool.submit(self.connect_services, attempt)
+
+    def connect_services(self, attempt):
+        """Refresh the token, then fetch the calendar client and profile side by side.
+
+        Runs on the request pool. The calendar client and the profile don't
+        depend on each other, so each is handed to the Tk main loop as soon as
+        it arrives and startup takes as long as the slower of the two.
+        """
+        from google.auth.exceptions import RefreshError
+
+        creds = self.credentials.credentials or self.credentials.load()
+        if creds is None:
+            # The stored token was unreadable and has been removed
+            self.after_idle(self.authenticate)
+            return
+
+        try:
+            self.credentials.refresh()
+        except RefreshError as e:
+            # The refresh token was revoked or expired, so sign in again
+            print(f"Error refreshing credentials: {e}")
+            self.after_idle(self.reauthenticate)
+            return
+        except Exception as e:
+            print(f"Error refreshing credentials: {e}")
+            self.after_idle(lambda: self.on_connect_failed(attempt))
+            return
+        # From here on the token is refreshed ahead of expiry, never mid-request
+        self.credentials.start()
+
+        # Both clients share the transport's pooled connections
+        http = self.transport.authorized(self.credentials)
+        self.request_pool.submit(self.connect_calendar, attempt, http)
+        self.request_pool.submit(self.fetch_profile, attempt, http)
+
+    def connect_calendar(self, attempt, http):
+        from googleapiclient.discovery import build
+
+        try:
+            with metrics.timer("startup.calendar_client_ms"):
+                service = build("calendar", "v3", http=http)
+        except Exception as e:
+            print(f"Error setting up services: {e}")
+            service = None
+        try:
+            self.after_idle(lambda: self.setup_services(attempt, service))
+        except RuntimeError:
+            pass  # The main loop has already exited
+
+    def fetch_profile(self, attempt, http):
+        from googleapiclient.discovery import build
+
+        try:
+            with metrics.timer("startup.profile_ms"):
+                user_info_service = build("oauth2", "v2", http=http)
+                user_info = user_info_service.userinfo().get().execute()
+        except Exception as e:
+            # The calendar works without it; keep showing the cached profile
+            print(f"Error fetching the user profile: {e}")
+            return
+        try:
+            self.after_idle(lambda: self.show_profile(attempt, user_info))
+        except RuntimeError:
+            pass  # The main loop has already exited
+
+    def stop_sync(self):
+        """Drop the service and its sync worker, and ignore pending connects."""
+        self.service = None
+        self.connect_attempt = None
+        if self.sync_worker:
+            self.sync_worker.stop()
+            self.sync_worker = None
+        self.scheduler.cancel("sync")
+        self.scheduler.cancel("reconnect")
+
+    def reauthenticate(self):
+        self.credentials.clear()
+        # The old worker still holds the revoked service; a new one starts
+        # once sign-in succeeds
+        self.stop_sync()
+        self.authenticate()
+
+    def on_token_revoked(self):
+        # Called from the refresh thread
+        try:
+            self.after_idle(self.reauthenticate)
+        except RuntimeError:
+            pass  # The main loop has already exited
+
+    def on_connect_failed(self, attempt):
+        if attempt is not self.connect_attempt:
+            return  # Logged out, or a newer attempt took over
+        if self.calendar_widget is None:
+            self.show_error_message("Failed to setup services. Please try again.")
+            return
+        # Keep showing the cached calendar and try again in a minute
+        self.scheduler.schedule("reconnect", 60, self.retry_connect)
+
+    def retry_connect(self):
+        # Give up if the user logged out or another attempt already succeeded
+        if self.service is None and self.calendar_widget is not None:
+            self.start_connect()
 
     def run_auth_flow(self, flow):
         """Run the OAuth flow in a separate thread and update the UI on completion."""
@@ -1054,9 +1279,8 @@ class CalendarWidget(tk.Tk):
             creds = flow.run_local_server(
                 port=0, access_type="offline", prompt="consent"
             )
-            self.save_credentials(creds)
-            # Use after_idle to safely update UI from the thread
-            self.after_idle(lambda: self.setup_services(creds))
+            self.credentials.set(creds)
+            self.after_idle(self.start_connect)
         except Exception as e:
             print(f"Authentication error: {e}")
             self.after_idle(
@@ -1065,37 +1289,109 @@ class CalendarWidget(tk.Tk):
                 )
             )
 
-    def setup_services(self, creds):
-        """Set up services after successful authentication"""
-        try:
-            self.service = build("calendar", "v3", credentials=creds)
-            user_info_service = build("oauth2", "v2", credentials=creds)
-            user_info = user_info_service.userinfo().get().execute()
-            self.user_name = user_info.get("name", "User")
-            self.user_image_url = user_info.get("picture", "")
+    def setup_services(self, attempt, service):
+        """Start syncing as soon as the calendar client is ready"""
+        if service is None:
+            self.on_connect_failed(attempt)
+            return
+        if attempt is not self.connect_attempt:
+            return  # Logged out, or a newer attempt took over
+        self.service = service
+        if self.calendar_widget is None:
+            # Show the events now; the header fills in when the profile arrives
             self.show_calendar_widget()
-        except Exception as e:
-            print(f"Error setting up services: {e}")
-            self.show_error_message("Failed to setup services. Please try again.")
+        self.start_sync_worker()
+
+    def show_profile(self, attempt, user_info):
+        """Fill in the header once the live profile arrives"""
+        if attempt is not self.connect_attempt:
+            return
+        self.user_name = user_info.get("name", "User")
+        self.user_image_url = user_info.get("picture", "")
+        self.cache.save(
+            profile={"name": self.user_name, "picture": self.user_image_url}
+        )
+        if self.calendar_widget is None:
+            self.show_calendar_widget()
+        else:
+            # Reconcile the widget painted from the cache or the defaults
+            self.calendar_widget.update_profile()
+
+    def start_sync_worker(self):
+        """Hand the calendar service to a background thread that fetches events."""
+        # Resume from the cached stores so the first sync is incremental
+        cached = self.cache.load()
+        calendar_sync = CalendarSync(self.service)
+        calendar_sync.restore(
+            cached.get("calendars", {}),
+            [Event.from_item(item) for item in cached.get("events", [])],
+            cached.get("sync_tokens", {}),
+        )
+        self.poll_policy = PollPolicy(
+            min_interval=get_int_setting("TIMETAB_POLL_MIN_SECONDS", 30),
+            max_interval=get_int_setting("TIMETAB_POLL_MAX_SECONDS", 600),
+        )
+        self.sync_worker = SyncWorker(
+            calendar_sync,
+            self.on_snapshot,
+            interval=None,
+            cache=self.cache,
+            on_error=self.on_sync_error,
+        )
+        self.sync_worker.start()
+        self.schedule_sync(self.poll_policy.max_interval)
+
+    def schedule_sync(self, delay):
+        self.scheduler.schedule("sync", delay, self.request_sync)
+
+    def request_sync(self):
+        """Ask the sync worker for fresh events."""
+        if self.sync_worker:
+            self.sync_worker.request_sync()
+            # The next sync is normally scheduled once this one reports back;
+            # this only fires if it never does
+            self.schedule_sync(self.poll_policy.max_interval)
+
+    def on_snapshot(self, snapshot):
+        """Called on the sync worker thread; hop back onto the Tk main loop."""
+        worker = self.sync_worker
+        try:
+            self.after_idle(lambda: self.show_snapshot(worker, snapshot))
+        except RuntimeError:
+            pass  # The main loop has already exited
+
+    def show_snapshot(self, worker, snapshot):
+        # Ignore snapshots from a worker that was stopped by a logout
+        if worker is not self.sync_worker:
+            return
+        self.poll_policy.record_success()
+        self.schedule_sync(
+            self.poll_policy.next_interval(snapshot.events, snapshot.synced_at)
+        )
+        if self.calendar_widget is not None:
+            self.calendar_widget.show_snapshot(snapshot)
+
+    def on_sync_error(self, error):
+        """Called on the sync worker thread when a sync failed."""
+        worker = self.sync_worker
+        try:
+            self.after_idle(lambda: self.sync_failed(worker))
+        except RuntimeError:
+            pass  # The main loop has already exited
 
-    def save_credentials(self, creds):
-        creds_data = {
-            "token": creds.token,
-            "refresh_token": creds.refresh_token,
-            "token_uri": creds.token_uri,
-            "client_id": creds.client_id,
-            "client_secret": creds.client_secret,
-            "scopes": creds.scopes,
-        }
-        # print(creds_data)
-        encrypted_creds = self.encryptor.encrypt(creds_data)
-        with open(self.token_path, "w") as token_file:
-            token_file.write(encrypted_creds)
+    def sync_failed(self, worker):
+        if worker is self.sync_worker:
+            self.poll_policy.record_failure()
+            self.schedule_sync(self.poll_policy.backoff())
 
 
 if __name__ == "__main__":
     app = CalendarWidget()
+    app.serve_commands(instance, startup_command)
     app.mainloop()
+    # Written once on the way out rather than on a timer, to keep idle wakeups away
+    app.dump_metrics()
+    instance.close()
 
 # pyinstaller --onefile --windowed --icon=timetab_win.ico --add-data "credentials.json;." --add-data "timetab_win.ico;." --name=timetab.exe pomo.py
 # pyinstaller --onefile --windowed --icon=timetab_win.ico --add-data "credentials.json;." --hidden-import cryptography --add-binary "C:\path\to\python\Lib\site-packages\cryptography\hazmat\bindings\\_padding.pyd;cryptography\hazmat\bindings" --add-binary "C:\path\to\python\Lib\site-packages\cryptography\hazmat\bindings\\_openssl.pyd;cryptography\hazmat\bindings" --name=timetab.exe auto.py
@@ -0,0 +1,199 @@
+"""Pomodoro timer logic, kept free of Tk so it can be driven on its own.
+
+The timer cycles focus -> break -> focus, with a long break after every
+``cycles`` focus sessions. It stores the wall-clock deadline of the running
+phase instead of counting ticks down, and remaining time is recomputed from
+that deadline whenever it is asked for. A stalled main loop therefore
+delays the next redraw but never makes a phase run long, and time spent
+asleep or closed counts like any other time.
+
+Every state change is handed to ``on_change``, which the widget uses to
+checkpoint the timer to disk; restoring the checkpoint and calling
+``catch_up`` resumes a session in constant time, without replaying ticks.
+"""
+
+import json
+import math
+import os
+import time
+
+# Wake this long after a second boundary so the display has already rolled over
+TICK_SLACK = 0.005
+
+FOCUS = "focus"
+BREAK = "break"
+LONG_BREAK = "long_break"
+PHASES = (FOCUS, BREAK, LONG_BREAK)
+
+
+class PomodoroTimer:
+    def __init__(
+        self,
+        focus_minutes=25,
+        long_break_minutes=15,
+        cycles=4,
+        clock=time.time,
+        on_change=None,
+    ):
+        self.focus_minutes = focus_minutes
+        self.long_break_minutes = long_break_minutes
+        self.cycles = cycles  # Focus sessions before a long break
+        self.clock = clock
+        self.on_change = on_change
+        self.phase = None  # None while idle
+        self.deadline = None
+        self.started_at = None  # Time the last focus session started, for the log
+        self.completed_cycles = 0  # Focus sessions since the last long break
+
+    @property
+    def active(self):
+        return self.phase is not None
+
+    @property
+    def focusing(self):
+        return self.phase == FOCUS
+
+    @property
+    def break_minutes(self):
+        return max(self.focus_minutes // 5, 5)
+
+    def phase_minutes(self, phase):
+        if phase == FOCUS:
+            return self.focus_minutes
+        if phase == LONG_BREAK:
+            return self.long_break_minutes
+        return self.break_minutes
+
+    def start(self):
+        """Start a focus session."""
+        self.phase = FOCUS
+        self.started_at = self.clock()
+        self.deadline = self.started_at + self.focus_minutes * 60
+        self._changed()
+
+    def stop(self):
+        """Stop a focus session or skip a break."""
+        self.phase = None
+        self.deadline = None
+        self._changed()
+
+    def set_focus_minutes(self, minutes):
+        """Change the session length, restarting a running focus session."""
+        self.focus_minutes = minutes
+        if self.focusing:
+            self.start()
+        else:
+            self._changed()
+
+    def remaining(self):
+        """Seconds left in the running phase, or a full session when idle."""
+        if not self.active:
+            return self.focus_minutes * 60
+        return max(self.deadline - self.clock(), 0)
+
+    def tick(self):
+        """Move on once the running phase is over, and return the phase that ended."""
+        if not self.active or self.remaining() > 0:
+            return None
+        ended = self.phase
+        if ended == FOCUS:
+            self.completed_cycles += 1
+            if self.completed_cycles >= self.cycles:
+                self.completed_cycles = 0
+                self.phase = LONG_BREAK
+            else:
+                self.phase = BREAK
+            # Count from the deadline, not from now, so a break that went by
+            # while the laptop slept is not started again on wake-up
+            self.deadline += self.phase_minutes(self.phase) * 60
+        else:
+            self.phase = None
+            self.deadline = None
+        self._changed()
+        return ended
+
+    def catch_up(self):
+        """Skip every phase that is over and return them, oldest first.
+
+        After a restart or a long sleep both the focus session and the break
+        after it may be over; a phase never chains into more than one other,
+        so this takes at most two steps however long the timer was away.
+        """
+        ended = []
+        phase = self.tick()
+        while phase:
+            ended.append(phase)
+            phase = self.tick()
+        return ended
+
+    def display(self):
+        if not self.active:
+            return f"{self.focus_minutes}:00"
+        # Round up so the display reads 25:00 at the start and 00:01 at the end
+        minutes, seconds = divmod(math.ceil(self.remaining()), 60)
+        return f"{minutes:02d}:{seconds:02d}"
+
+    def next_tick_delay(self):
+        """Seconds until the displayed time next changes."""
+        if not self.active:
+            return 1
+        remaining = self.remaining()
+        return (remaining - math.floor(remaining) or 1) + TICK_SLACK
+
+    def to_dict(self):
+        return {
+            "phase": self.phase,
+            "deadline": self.deadline,
+            "started_at": self.started_at,
+            "completed_cycles": self.completed_cycles,
+            "focus_minutes": self.focus_minutes,
+        }
+
+    def restore(self, state):
+        """Take over a state saved with ``to_dict``; call ``catch_up`` next."""
+        phase = state.get("phase")
+        deadline = state.get("deadline")
+        if phase in PHASES and isinstance(deadline, (int, float)):
+            self.phase = phase
+            self.deadline = deadline
+        self.started_at = state.get("started_at")
+        self.completed_cycles = int(state.get("completed_cycles") or 0)
+        self.focus_minutes = int(state.get("focus_minutes") or self.focus_minutes)
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change(self)
+
+
+class PomodoroCheckpoint:
+    """The timer's state in a small JSON file, rewritten on every change."""
+
+    def __init__(self, path):
+        self.path = path
+        self.saved = None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r") as checkpoint_file:
+                self.saved = json.load(checkpoint_file)
+        except (OSError, ValueError) as e:
+            print(f"Error loading pomodoro checkpoint: {e}")
+            return None
+        return self.saved
+
+    def save(self, timer):
+        state = timer.to_dict()
+        if state == self.saved:
+            return
+        # Write to a temporary file first so a crash never leaves half a file
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as checkpoint_file:
+                json.dump(state, checkpoint_file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving pomodoro checkpoint: {e}")
+            return
+        self.saved = state
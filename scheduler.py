@@ -0,0 +1,181 @@
+"""A single-timer scheduler for everything the widget has to do later.
+
+Every pending deadline (clock rollover, pomodoro tick, event boundaries,
+sync interval, notification expiry) is kept in one heap, and only one Tk
+``after`` is armed at a time, for the earliest of them. An idle widget
+therefore only wakes up when something is actually due.
+"""
+
+import collections
+import datetime
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+
+import metrics
+
+# Alarms found up to this many seconds late, e.g. at startup, still fire
+ALARM_GRACE = 60
+
+
+class Scheduler:
+    def __init__(self, widget, clock=time.monotonic):
+        self.widget = widget
+        self.clock = clock
+        self._heap = []  # (deadline, sequence, key)
+        self._jobs = {}  # key -> (deadline, sequence, callback)
+        self._sequence = itertools.count()
+        self._after_id = None
+        self._armed_deadline = None
+
+    def schedule(self, key, delay, callback):
+        """Run ``callback`` in ``delay`` seconds, replacing any job with ``key``."""
+        self.schedule_at(key, self.clock() + delay, callback)
+
+    def schedule_at(self, key, deadline, callback):
+        sequence = next(self._sequence)
+        self._jobs[key] = (deadline, sequence, callback)
+        heapq.heappush(self._heap, (deadline, sequence, key))
+        self._arm()
+
+    def cancel(self, key):
+        if self._jobs.pop(key, None) is not None:
+            self._arm()
+
+    def cancel_all(self):
+        self._jobs.clear()
+        self._heap.clear()
+        self._arm()
+
+    def pending(self, key):
+        return key in self._jobs
+
+    def _next_deadline(self):
+        # Cancelled and rescheduled jobs are dropped lazily from the heap
+        while self._heap:
+            deadline, sequence, key = self._heap[0]
+            job = self._jobs.get(key)
+            if job is not None and job[1] == sequence:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    def _arm(self):
+        deadline = self._next_deadline()
+        if deadline == self._armed_deadline:
+            return
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        self._armed_deadline = deadline
+        if deadline is not None:
+            delay_ms = max(math.ceil((deadline - self.clock()) * 1000), 0)
+            self._after_id = self.widget.after(delay_ms, self._run)
+
+    def _run(self):
+        self._after_id = None
+        self._armed_deadline = None
+        now = self.clock()
+        while True:
+            deadline = self._next_deadline()
+            if deadline is None or deadline > now:
+                break
+            _, _, key = heapq.heappop(self._heap)
+            _, _, callback = self._jobs.pop(key)
+            # How late the main loop ran the job, e.g. pomodoro tick jitter
+            name = key if isinstance(key, str) else key[0]
+            metrics.observe(f"scheduler.lateness_ms[{name}]", (now - deadline) * 1000)
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error running scheduled {key}: {e}")
+        self._arm()
+
+
+class EventAlarms:
+    """Fire notifications at the exact start of events, once per event.
+
+    Each event gets a start alarm and, with ``reminder_minutes``, a reminder
+    that many minutes before. Alarms due at the same instant share one
+    scheduler job, so simultaneous events are reported together. The alarms
+    that already fired are saved to ``path`` so a restart does not repeat
+    them.
+    """
+
+    def __init__(self, scheduler, path, on_alarm, reminder_minutes=0):
+        self.scheduler = scheduler
+        self.path = path
+        self.on_alarm = on_alarm
+        self.reminder_minutes = reminder_minutes
+        self.job_keys = set()
+        self.notified = self._load()
+
+    def update(self, events):
+        """Re-arm the alarms for the events that are currently known."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        due = collections.defaultdict(list)
+        known = set()
+        for event in events:
+            if event.all_day:
+                continue  # All-day events have no start to announce
+            for kind, at in self._alarm_times(event.start):
+                alarm_id = f"{kind}:{event.id}:{event.start.isoformat()}"
+                if alarm_id in known:
+                    continue  # The same event shared by another calendar
+                known.add(alarm_id)
+                if alarm_id in self.notified:
+                    continue
+                if at > now:
+                    due[kind, at].append((alarm_id, event))
+                elif (now - at).total_seconds() <= ALARM_GRACE:
+                    due[kind, now].append((alarm_id, event))
+
+        # Forget alarms for events that ended or were removed
+        if not self.notified <= known:
+            self.notified &= known
+            self._save()
+
+        job_keys = set()
+        for (kind, at), alarms in due.items():
+            key = ("alarm", kind, at.isoformat())
+            job_keys.add(key)
+            delay = max((at - now).total_seconds(), 0)
+            self.scheduler.schedule(key, delay, self._fire_callback(kind, alarms))
+        for key in self.job_keys - job_keys:
+            self.scheduler.cancel(key)
+        self.job_keys = job_keys
+
+    def clear(self):
+        for key in self.job_keys:
+            self.scheduler.cancel(key)
+        self.job_keys = set()
+        self.notified = set()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _alarm_times(self, start):
+        yield "start", start
+        if self.reminder_minutes:
+            yield "reminder", start - datetime.timedelta(minutes=self.reminder_minutes)
+
+    def _fire_callback(self, kind, alarms):
+        def fire():
+            self.notified.update(alarm_id for alarm_id, _ in alarms)
+            self._save()
+            self.on_alarm(kind, [event for _, event in alarms])
+
+        return fire
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as notified_file:
+                return set(json.load(notified_file))
+        except (OSError, ValueError):
+            return set()
+
+    def _save(self):
+        with open(self.path, "w") as notified_file:
+            json.dump(sorted(self.notified), notified_file)
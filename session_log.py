@@ -0,0 +1,145 @@
+"""A persistent log of focus sessions, with daily and weekly totals.
+
+Every session that ends, completed or interrupted, is appended to the
+``sessions`` table of a SQLite database in the config directory. The
+``daily`` and ``weekly`` rollup tables are updated in the same transaction,
+so stats are read from a handful of precomputed rows instead of scanning
+months of history, and the totals can never disagree with the log.
+"""
+
+import collections
+import datetime
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL,
+    planned_seconds INTEGER NOT NULL,
+    completed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily (
+    day TEXT PRIMARY KEY,
+    sessions INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    focused_seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS weekly (
+    week TEXT PRIMARY KEY,
+    sessions INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    focused_seconds REAL NOT NULL
+);
+"""
+
+# Adds one session to a rollup row, creating the row on the first session
+ROLLUP_UPSERT = """
+INSERT INTO {table} ({key}, sessions, completed, focused_seconds)
+VALUES (?, 1, ?, ?)
+ON CONFLICT ({key}) DO UPDATE SET
+    sessions = sessions + 1,
+    completed = completed + excluded.completed,
+    focused_seconds = focused_seconds + excluded.focused_seconds
+"""
+
+Totals = collections.namedtuple("Totals", ["sessions", "completed", "focused_seconds"])
+NO_SESSIONS = Totals(0, 0, 0.0)
+
+
+def week_key(day):
+    """The ISO week ``day`` falls in, e.g. ``2024-W07``."""
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def format_totals(totals):
+    minutes = round(totals.focused_seconds / 60)
+    interrupted = totals.sessions - totals.completed
+    return (
+        f"{minutes // 60}h {minutes % 60:02d}m focused, "
+        f"{totals.completed} completed, {interrupted} interrupted"
+    )
+
+
+class SessionLog:
+    """Append-only focus session log.
+
+    Sessions count towards the local day and ISO week they started in.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.connection = sqlite3.connect(path)
+        # WAL makes each append a cheap sequential write
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def record(self, started_at, planned_seconds, completed, ended_at=None):
+        """Append a session that ran from ``started_at`` (a POSIX time) until now."""
+        ended_at = self.clock() if ended_at is None else ended_at
+        focused = max(ended_at - started_at, 0)
+        day = datetime.date.fromtimestamp(started_at)
+        completed = int(bool(completed))
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO sessions (started_at, ended_at, planned_seconds, completed)"
+                " VALUES (?, ?, ?, ?)",
+                (started_at, ended_at, planned_seconds, completed),
+            )
+            for table, key, value in (
+                ("daily", "day", day.isoformat()),
+                ("weekly", "week", week_key(day)),
+            ):
+                self.connection.execute(
+                    ROLLUP_UPSERT.format(table=table, key=key),
+                    (value, completed, focused),
+                )
+
+    def day_totals(self, day):
+        return self._totals("daily", "day", day.isoformat())
+
+    def week_totals(self, day):
+        """Totals for the ISO week that ``day`` falls in."""
+        return self._totals("weekly", "week", week_key(day))
+
+    def daily_totals(self, first_day, last_day):
+        """Totals for every day from ``first_day`` to ``last_day``, oldest first."""
+        rows = self.connection.execute(
+            "SELECT day, sessions, completed, focused_seconds FROM daily"
+            " WHERE day BETWEEN ? AND ?",
+            (first_day.isoformat(), last_day.isoformat()),
+        )
+        found = {row[0]: Totals(*row[1:]) for row in rows}
+        days = (last_day - first_day).days + 1
+        return [
+            (day, found.get(day.isoformat(), NO_SESSIONS))
+            for day in (first_day + datetime.timedelta(days=n) for n in range(days))
+        ]
+
+    def summary(self, today=None):
+        """Today, this week and the last seven days as plain text."""
+        today = today or datetime.date.today()
+        lines = [
+            f"Today: {format_totals(self.day_totals(today))}",
+            f"This week: {format_totals(self.week_totals(today))}",
+            "",
+        ]
+        week_ago = today - datetime.timedelta(days=6)
+        for day, totals in self.daily_totals(week_ago, today):
+            lines.append(f"{day:%a %d %b}: {format_totals(totals)}")
+        return "\n".join(lines)
+
+    def close(self):
+        self.connection.close()
+
+    def _totals(self, table, key, value):
+        row = self.connection.execute(
+            f"SELECT sessions, completed, focused_seconds FROM {table}"
+            f" WHERE {key} = ?",
+            (value,),
+        ).fetchone()
+        return Totals(*row) if row else NO_SESSIONS
@@ -0,0 +1,119 @@
+"""Settings and secrets shared by the widget and the headless command line.
+
+Nothing here imports Tk, so the command line can use it without starting a
+GUI.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import sys
+
+SCOPES = [
+    "https://www.googleapis.com/auth/calendar.events.readonly",
+    "https://www.googleapis.com/auth/calendar.calendarlist.readonly",
+    "https://www.googleapis.com/auth/userinfo.profile",
+]
+REDIRECT_URI = "https://localhost:8080/"
+
+
+def get_resource_path(relative_path):
+    """Get absolute path to resource, works for dev and for PyInstaller bundle."""
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+
+def get_int_setting(name, default):
+    """Read an integer setting from the environment or the .env file."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Ignoring {name}={value!r}, expected a whole number")
+        return default
+
+
+def get_config_path():
+    """Get the path to the configuration directory."""
+    if sys.platform == "win32":
+        return os.path.join(os.environ["APPDATA"], "TimeTab")
+    elif sys.platform == "darwin":
+        return os.path.join(
+            os.path.expanduser("~"), "Library", "Application Support", "TimeTab"
+        )
+    else:  # linux or other unix-like
+        return os.path.join(os.path.expanduser("~"), ".config", "timetab")
+
+
+class Encryptor:
+    def __init__(self, key):
+        from cryptography.fernet import Fernet
+
+        self.key = base64.urlsafe_b64encode(hashlib.sha256(key.encode()).digest())
+        self.f = Fernet(self.key)
+
+    def encrypt(self, data):
+        return self.f.encrypt(json.dumps(data).encode()).decode()
+
+    def decrypt(self, data):
+        return json.loads(self.f.decrypt(data.encode()).decode())
+
+
+def load_encryptor():
+    """Load the .env file and return the Encryptor for the token and cache."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    encryption_key = os.getenv("ENCRYPTION_KEY")
+    if not encryption_key:
+        encryption_key = base64.b64encode(os.urandom(32)).decode()
+        # print("No encryption key set, generated a random one:")
+        # print(encryption_key)
+
+    # Initialize encryptor with a secret key (you should use a more secure key in production)
+    return Encryptor(encryption_key)
+
+
+def create_transport():
+    """The shared HttpTransport, with timeouts and retries from the environment.
+
+    ``TIMETAB_HTTP_RECORD`` records every exchange to a fixture file, and
+    ``TIMETAB_HTTP_REPLAY`` answers from one instead of the network.
+    """
+    import metrics
+
+    options = {
+        "connect_timeout": get_int_setting("TIMETAB_CONNECT_TIMEOUT", 5),
+        "read_timeout": get_int_setting("TIMETAB_READ_TIMEOUT", 30),
+        "retries": get_int_setting("TIMETAB_HTTP_RETRIES", 2),
+        "on_request": metrics.registry.record_request,
+    }
+    if os.getenv("TIMETAB_HTTP_REPLAY"):
+        from http_replay import ReplayTransport
+
+        replay_options = {
+            "latency": get_int_setting("TIMETAB_REPLAY_LATENCY_MS", 0) / 1000,
+            "jitter": get_int_setting("TIMETAB_REPLAY_JITTER_MS", 0) / 1000,
+            "error_rate": get_int_setting("TIMETAB_REPLAY_ERROR_PERCENT", 0) / 100,
+            "quota_rate": get_int_setting("TIMETAB_REPLAY_QUOTA_PERCENT", 0) / 100,
+            "gone_rate": get_int_setting("TIMETAB_REPLAY_GONE_PERCENT", 0) / 100,
+            "seed": get_int_setting("TIMETAB_REPLAY_SEED", None),
+        }
+        return ReplayTransport(
+            os.getenv("TIMETAB_HTTP_REPLAY"), replay_options, **options
+        )
+    if os.getenv("TIMETAB_HTTP_RECORD"):
+        from http_replay import RecordingTransport
+
+        return RecordingTransport(os.getenv("TIMETAB_HTTP_RECORD"), **options)
+
+    from http_transport import HttpTransport
+
+    return HttpTransport(**options)
@@ -0,0 +1,169 @@
+"""Keep one TimeTab running and let later launches talk to it.
+
+The first launch takes an OS file lock on ``instance.lock`` in the config
+directory and listens on a localhost port, which it writes to
+``instance.json`` together with a random token. A later launch fails to
+take the lock, sends its command to that port and exits, so a second
+window, auth flow and polling loop are never started. The OS drops the
+lock when the process dies, so a crash never leaves a stale lock behind.
+
+Only the standard library is used here; forwarding a command loads neither
+Tk nor the Google client libraries.
+"""
+
+import hmac
+import json
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+
+HOST = "127.0.0.1"
+USAGE = "commands: show | focus [minutes] | refresh"
+REPLY_TIMEOUT = 2  # Seconds to wait for the running instance to answer
+STARTUP_WAIT = 3  # Seconds to wait for a starting instance to start listening
+
+
+def parse_command(words):
+    """Turn command line words into ``(name, args)``; raise ValueError if unknown.
+
+    ``start focus 25`` and ``refresh now`` read naturally, so the ``start``
+    and ``now`` are accepted and dropped.
+    """
+    words = [word.lower() for word in words]
+    if words[:1] == ["start"]:
+        words = words[1:]
+    if words[-1:] == ["now"]:
+        words = words[:-1]
+    if not words or words == ["show"]:
+        return "show", []
+    if words == ["refresh"]:
+        return "refresh", []
+    if words[0] == "focus" and len(words) <= 2:
+        minutes = int(words[1]) if len(words) == 2 else None
+        if minutes is not None and not 1 <= minutes <= 120:
+            raise ValueError("focus takes 1 to 120 minutes")
+        return "focus", [minutes] if minutes else []
+    raise ValueError(f"unknown command {' '.join(words)!r}; {USAGE}")
+
+
+class SingleInstance:
+    """The lock and command channel of the running instance."""
+
+    def __init__(self, config_dir):
+        self.lock_path = os.path.join(config_dir, "instance.lock")
+        self.info_path = os.path.join(config_dir, "instance.json")
+        self.lock_file = None
+        self.server = None
+
+    def acquire(self):
+        """Take the lock, or return False if another instance holds it."""
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        lock_file = open(self.lock_path, "a+")
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def serve(self, on_command):
+        """Listen for commands from later launches on a background thread.
+
+        ``on_command(name, args)`` runs on that thread and must hand the
+        command over to the UI itself.
+        """
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind((HOST, 0))
+        self.server.listen()
+        token = secrets.token_hex(16)
+        info = {
+            "port": self.server.getsockname()[1],
+            "token": token,
+            "pid": os.getpid(),
+        }
+        tmp_path = f"{self.info_path}.tmp"
+        with open(tmp_path, "w") as info_file:
+            json.dump(info, info_file)
+        os.replace(tmp_path, self.info_path)
+        threading.Thread(
+            target=self._accept, args=(token, on_command), daemon=True
+        ).start()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+            try:
+                os.remove(self.info_path)
+            except OSError:
+                pass
+        if self.lock_file is not None:
+            self.lock_file.close()  # Closing the file releases the lock
+            self.lock_file = None
+
+    def _accept(self, token, on_command):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return  # The server was closed
+            with connection:
+                connection.settimeout(REPLY_TIMEOUT)
+                try:
+                    request = json.loads(_read_line(connection))
+                    if not hmac.compare_digest(str(request.get("token")), token):
+                        reply = "error: bad token"
+                    else:
+                        name, args = parse_command(request.get("command", []))
+                        on_command(name, args)
+                        reply = "ok"
+                except (OSError, ValueError) as e:
+                    reply = f"error: {e}"
+                try:
+                    connection.sendall(reply.encode() + b"\n")
+                except OSError:
+                    pass
+
+
+def send_command(config_dir, words):
+    """Send a command to the running instance and return its reply, or None."""
+    info_path = os.path.join(config_dir, "instance.json")
+    deadline = time.monotonic() + STARTUP_WAIT
+    while True:
+        try:
+            with open(info_path, "r") as info_file:
+                info = json.load(info_file)
+            with socket.create_connection(
+                (HOST, info["port"]), timeout=REPLY_TIMEOUT
+            ) as connection:
+                request = {"token": info["token"], "command": list(words)}
+                connection.sendall(json.dumps(request).encode() + b"\n")
+                return _read_line(connection)
+        except (OSError, ValueError, KeyError) as e:
+            # The other instance may hold the lock but not be listening yet
+            if time.monotonic() > deadline:
+                print(f"Error reaching the running TimeTab: {e}")
+                return None
+            time.sleep(0.05)
+
+
+def _read_line(connection):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = connection.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data.decode().strip()
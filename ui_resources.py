@@ -0,0 +1,201 @@
+"""Tk resources that are created once and then reused.
+
+Resolving the icon, building a Toplevel and laying out its labels each take
+milliseconds, and every hover and notification used to pay for them again.
+``Resources`` loads the icon and images once, and keeps one tooltip window,
+one break window and a small pool of notification windows. These are
+shown and hidden instead of being created and destroyed, so hovering stays
+instant and the number of Tk objects stays bounded.
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+import metrics
+from settings import get_resource_path
+
+ICON_NAME = "timetab_win.ico"
+MAX_NOTIFICATIONS = 3  # Pooled windows; after that the oldest one is reused
+NOTIFICATION_SECONDS = 10  # Notifications hide themselves after this long
+BACKGROUND = "#f0f0f0"
+
+
+class TooltipWindow:
+    """A borderless window holding a single label, moved to wherever it is needed."""
+
+    def __init__(self, root):
+        self.window = tk.Toplevel(root)
+        self.window.withdraw()
+        self.window.wm_overrideredirect(True)
+        self.label = tk.Label(
+            self.window,
+            justify=tk.LEFT,
+            background="#ffffe0",
+            relief=tk.SOLID,
+            borderwidth=1,
+            font=("tahoma", "8", "normal"),
+        )
+        self.label.pack(ipadx=1)
+        self.visible = False
+
+    def show(self, text, x, y):
+        if not text:
+            return
+        self.label.config(text=text)
+        self.window.wm_geometry(f"+{x}+{y}")
+        if not self.visible:
+            self.window.deiconify()
+            self.visible = True
+        self.window.lift()
+
+    def hide(self):
+        if self.visible:
+            self.window.withdraw()
+            self.visible = False
+
+
+class NotificationWindow:
+    """Lists the events that start together; hidden rather than destroyed."""
+
+    def __init__(self, root):
+        self.window = tk.Toplevel(root)
+        self.window.withdraw()
+        self.window.title("Event Starting")
+        self.window.minsize(300, 150)
+        self.window.attributes("-topmost", True)
+        self.window.configure(bg=BACKGROUND)
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+
+        self.title_label = tk.Label(
+            self.window, font=("Helvetica", 14, "bold"), bg=BACKGROUND
+        )
+        self.title_label.pack(pady=(10, 5))
+        self.rows_frame = tk.Frame(self.window, bg=BACKGROUND)
+        self.rows_frame.pack()
+        self.rows = []  # (summary label, time label), grown as needed
+        close_button = tk.Button(
+            self.window, text="Close", command=self.hide, bg="#4CAF50", fg="white"
+        )
+        close_button.pack(pady=10)
+        self.visible = False
+
+    def show(self, title, events):
+        self.title_label.config(text=title)
+        while len(self.rows) < len(events):
+            self.rows.append(
+                (
+                    tk.Label(self.rows_frame, font=("Helvetica", 12), bg=BACKGROUND),
+                    tk.Label(self.rows_frame, font=("Helvetica", 10), bg=BACKGROUND),
+                )
+            )
+        for number, (summary_label, time_label) in enumerate(self.rows):
+            if number < len(events):
+                summary_label.config(text=events[number].summary)
+                time_label.config(text=events[number].time_text)
+                summary_label.pack(pady=(5, 0))
+                time_label.pack(pady=(0, 5))
+            else:
+                summary_label.pack_forget()
+                time_label.pack_forget()
+        # Fit the window to however many events it now lists
+        self.window.geometry("")
+        self.window.deiconify()
+        self.window.lift()
+        self.visible = True
+
+    def hide(self):
+        if self.visible:
+            self.window.withdraw()
+            self.visible = False
+
+
+class MessageWindow:
+    """A maximized, always-on-top message with an OK button."""
+
+    def __init__(self, root, title):
+        self.window = tk.Toplevel(root)
+        self.window.withdraw()
+        self.window.title(title)
+        self.window.attributes("-topmost", True)
+        self.window.protocol("WM_DELETE_WINDOW", self.window.withdraw)
+        self.message = ttk.Label(
+            self.window, font=("Helvetica", 12), background="#ffffff"
+        )
+        self.message.pack(pady=20)
+        ttk.Button(self.window, text="OK", command=self.window.withdraw).pack(pady=10)
+
+    def show(self, text):
+        self.message.config(text=text)
+        self.window.deiconify()
+        # Maximize the window
+        self.window.state("zoomed")
+        self.window.focus_force()
+
+
+class Resources:
+    """The icon, images and pooled windows of one Tk root."""
+
+    def __init__(self, root, scheduler):
+        self.root = root
+        self.scheduler = scheduler
+        self.icon_path = get_resource_path(ICON_NAME)
+        self.images = {}  # Path -> PhotoImage
+        self.notifications = []  # Least recently shown first
+        self._tooltip = None
+        self._break_window = None
+
+    def apply_icon(self):
+        """Load the icon once, as the default of every window of the app."""
+        self.root.iconbitmap(default=self.icon_path)
+
+    def image(self, path):
+        """A PhotoImage of ``path``, read from disk only the first time."""
+        image = self.images.get(path)
+        if image is None:
+            image = self.images[path] = tk.PhotoImage(file=path)
+        return image
+
+    def forget(self, path):
+        """Drop the image of ``path``, e.g. once its file has been replaced."""
+        self.images.pop(path, None)
+
+    @property
+    def tooltip(self):
+        if self._tooltip is None:
+            self._tooltip = TooltipWindow(self.root)
+            metrics.increment("ui.windows_created")
+        return self._tooltip
+
+    def notify(self, title, events):
+        """Show one notification listing ``events``, using a pooled window."""
+        window = next(
+            (window for window in self.notifications if not window.visible), None
+        )
+        if window is None and len(self.notifications) < MAX_NOTIFICATIONS:
+            window = NotificationWindow(self.root)
+            metrics.increment("ui.windows_created")
+        elif window is None:
+            window = self.notifications[0]
+        if window in self.notifications:
+            self.notifications.remove(window)
+        self.notifications.append(window)
+        window.show(title, events)
+        self.scheduler.schedule(
+            ("notification", id(window)), NOTIFICATION_SECONDS, window.hide
+        )
+
+    def hide_all(self):
+        """Hide every pooled window, e.g. when the session they belong to ends."""
+        for window in self.notifications:
+            window.hide()
+            self.scheduler.cancel(("notification", id(window)))
+        if self._tooltip is not None:
+            self._tooltip.hide()
+        if self._break_window is not None:
+            self._break_window.window.withdraw()
+
+    def show_break(self, text):
+        if self._break_window is None:
+            self._break_window = MessageWindow(self.root, "Break Time")
+            metrics.increment("ui.windows_created")
+        self._break_window.show(text)